@@ -4,6 +4,9 @@ import time
 from ecdsa import SigningKey, NIST256p
 from hashlib import sha256
 
+from SM3_vectorized import SM3
+from op_counter import op_cost
+
 
 # SM2推荐曲线参数
 P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
@@ -14,6 +17,8 @@ Gx = 0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7
 Gy = 0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0
 
 class SM2:
+    OP_ENTRY_POINTS = ("generate_keypair", "encrypt", "decrypt", "sign", "sign_specific_k", "verify")
+
     def __init__(self):
         self.p = P
         self.a = A
@@ -24,9 +29,11 @@ class SM2:
         self.precompute_table = self._precompute_fixed_point(self.G, self.window_size)
 
     # --------- 椭圆曲线基础与点乘（雅可比+预计算+窗口法） ---------
+    @op_cost({"inv": 1})
     def _mod_inverse(self, a, p):
         return pow(a, -1, p)
 
+    @op_cost(lambda P, Q: {"add": 1, "mul": 12, "sqr": 4} if P[2] and Q[2] else {})
     def _jacobian_add(self, P, Q):
         if P[2] == 0:
             return Q
@@ -64,6 +71,7 @@ class SM2:
 
         return (X3, Y3, Z3)
 
+    @op_cost(lambda P: {"dbl": 1, "mul": 4, "sqr": 6} if P[2] and P[1] else {})
     def _jacobian_double(self, P):
         X1, Y1, Z1 = P
         if Z1 == 0 or Y1 == 0:
@@ -78,6 +86,7 @@ class SM2:
 
         return (X3, Y3, Z3)
 
+    @op_cost(lambda P: {"mul": 3, "sqr": 1} if P[2] else {})
     def _jacobian_to_affine(self, P):
         X, Y, Z = P
         if Z == 0:
@@ -152,7 +161,7 @@ class SM2:
         try:
             h = hashlib.new('sm3')
         except:
-            h = hashlib.sha256()
+            h = SM3()
         h.update(data)
         return h.digest()
 
@@ -3,6 +3,9 @@ import hashlib
 import time
 import binascii
 
+from SM3_vectorized import SM3
+from op_counter import op_cost
+
 # SM2标准推荐曲线参数（sm2p256v1）
 P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
 A = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC
@@ -12,7 +15,18 @@ Gx = 0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7
 Gy = 0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0
 
 
+def _affine_add_cost(p1, p2):
+    # 与 SM2._point_add 的分支一致；模逆由 _mod_inverse 单独计数
+    if p1 == (0, 0) or p2 == (0, 0) or (p1[0] == p2[0] and (p1[1] + p2[1]) % P == 0):
+        return {}
+    if p1 == p2:
+        return {"dbl": 1, "mul": 2, "sqr": 2}
+    return {"add": 1, "mul": 2, "sqr": 1}
+
+
 class SM2:
+    OP_ENTRY_POINTS = ("generate_keypair", "encrypt", "decrypt")
+
     def __init__(self):
         self.p = P
         self.a = A
@@ -21,12 +35,14 @@ class SM2:
         self.G = (Gx, Gy)
 
     # 模逆运算（扩展欧几里得算法）
+    @op_cost({"inv": 1})
     def _mod_inverse(self, a, p):
         if a == 0:
             raise ZeroDivisionError("Inverse of 0 is undefined")
         return pow(a, -1, p)
 
     # 椭圆曲线点加法
+    @op_cost(_affine_add_cost)
     def _point_add(self, P, Q):
         if P == (0, 0): return Q
         if Q == (0, 0): return P
@@ -55,12 +71,12 @@ class SM2:
             k >>= 1
         return result
 
-    # KDF（密钥派生函数）使用SM3（如不可用则回退SHA256）
+    # KDF（密钥派生函数）使用SM3（OpenSSL 不支持时使用纯 Python 实现）
     def _hash(self, data):
         try:
             sm3 = hashlib.new('sm3')
         except ValueError:
-            sm3 = hashlib.sha256()  # fallback
+            sm3 = SM3()  # fallback
         sm3.update(data)
         return sm3.digest()
 
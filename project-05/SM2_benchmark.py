@@ -0,0 +1,210 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+from SM2_basic import SM2 as SM2Basic
+from SM2_optimized import SM2 as SM2Optimized
+from SM2_POC import SM2 as SM2POC
+
+IMPLEMENTATIONS = {
+    "basic": SM2Basic,
+    "optimized": SM2Optimized,
+    "poc": SM2POC,
+}
+OPERATIONS = ("keygen", "sign", "verify", "encrypt", "decrypt")
+
+
+def percentile(sorted_values, q):
+    # 最近秩法：第 ceil(q/100 * N) 个值
+    idx = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def _prepare(sm2, op, msg):
+    """返回一次被测操作的无参函数；准备工作（密钥、密文、签名）不计入耗时。"""
+    priv, pub = sm2.generate_keypair()
+    if op == "keygen":
+        return sm2.generate_keypair
+    if op == "sign":
+        return lambda: sm2.sign(priv, msg)
+    if op == "verify":
+        sig = sm2.sign(priv, msg)
+        return lambda: sm2.verify(pub, msg, sig)
+    if op == "encrypt":
+        return lambda: sm2.encrypt(pub, msg)
+    if op == "decrypt":
+        ciphertext = sm2.encrypt(pub, msg)
+        return lambda: sm2.decrypt(priv, ciphertext)
+    raise ValueError(op)
+
+
+def bench_one(sm2, op, size, iterations, warmup):
+    msg = os.urandom(size) if size is not None else None
+    func = _prepare(sm2, op, msg)
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        t1 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t1) * 1000)
+    samples.sort()
+    return {
+        "n": iterations,
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
+
+
+def run_benchmarks(impls, ops, sizes, iterations, warmup):
+    results = []
+    for name in impls:
+        sm2 = IMPLEMENTATIONS[name]()
+        for op in ops:
+            if op in ("sign", "verify") and not hasattr(sm2, "sign"):
+                continue
+            for size in ([None] if op == "keygen" else sizes):
+                stats = bench_one(sm2, op, size, iterations, warmup)
+                results.append(dict(impl=name, op=op, size=size, **stats))
+                print(f"{name:<10} {op:<8} {str(size):>7}  p50={stats['p50_ms']:.3f} ms  "
+                      f"p95={stats['p95_ms']:.3f} ms  p99={stats['p99_ms']:.3f} ms", file=sys.stderr)
+    return results
+
+
+def _seeded(seed, func, *args):
+    # 三个实现都在调用开头用 random.randint 取 k，固定种子即可让它们使用同一个随机标量
+    random.seed(seed)
+    return func(*args)
+
+
+def differential_check(trials, sizes):
+    """用相同的私钥与随机标量驱动三个实现，检查结果互相一致、互相可验证。
+
+    basic 版的 KDF / C3 输出与另外两个实现不兼容：仍然尝试互相解密，
+    不能互解的情况记入 incompatible，而不计为失败。
+    """
+    basic, opt, poc = SM2Basic(), SM2Optimized(), SM2POC()
+    failures = []
+    incompatible = []
+
+    def check(cond, what, trial):
+        if not cond:
+            failures.append({"trial": trial, "check": what})
+
+    def cross_decrypt(sm2, ciphertext, msg, what, trial):
+        try:
+            error = None if sm2.decrypt(d, ciphertext) == msg else "wrong plaintext"
+        except ValueError as e:
+            error = str(e)
+        if error:
+            incompatible.append({"trial": trial, "check": what, "error": error})
+
+    for trial in range(trials):
+        d = random.randint(1, opt.n - 1)
+        pub = opt._point_mul(d, opt.G)
+        check(basic._point_mul(d, basic.G) == pub, "basic public key", trial)
+        check(poc._point_mul(d, poc.G) == pub, "poc public key", trial)
+
+        for size in sizes:
+            msg = os.urandom(size)
+            seed = random.getrandbits(64)
+
+            sig_opt = _seeded(seed, opt.sign, d, msg)
+            sig_poc = _seeded(seed, poc.sign, d, msg)
+            check(sig_opt == sig_poc, f"identical signature (size={size})", trial)
+            check(poc.verify(pub, msg, sig_opt), f"poc verifies optimized signature (size={size})", trial)
+            check(opt.verify(pub, msg, sig_poc), f"optimized verifies poc signature (size={size})", trial)
+
+            ct_opt = _seeded(seed, opt.encrypt, pub, msg)
+            ct_poc = _seeded(seed, poc.encrypt, pub, msg)
+            ct_basic = _seeded(seed, basic.encrypt, pub, msg)
+            check(ct_opt == ct_poc, f"identical ciphertext optimized/poc (size={size})", trial)
+            check(ct_basic[:65] == ct_opt[:65], f"identical C1 basic/optimized (size={size})", trial)
+            cross_decrypt(basic, ct_opt, msg, f"basic decrypts optimized ciphertext (size={size})", trial)
+            cross_decrypt(opt, ct_basic, msg, f"optimized decrypts basic ciphertext (size={size})", trial)
+            check(poc.decrypt(d, ct_opt) == msg, f"poc decrypts optimized ciphertext (size={size})", trial)
+            check(opt.decrypt(d, ct_poc) == msg, f"optimized decrypts poc ciphertext (size={size})", trial)
+            check(basic.decrypt(d, ct_basic) == msg, f"basic round trip (size={size})", trial)
+    if incompatible:
+        print(f"注意: basic 与 optimized 的密文有 {len(incompatible)} 次不能互相解密"
+              f"（basic 版 KDF / C3 输出不兼容），见 differential.incompatible", file=sys.stderr)
+    return {"trials": trials, "failures": failures, "incompatible": incompatible}
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """p50 比基线慢超过 threshold（相对比例）即视为回退。"""
+    base = {(r["impl"], r["op"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["impl"], r["op"], r["size"]))
+        if b is None:
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"] if b["p50_ms"] else float("inf")
+        if ratio > 1 + threshold:
+            regressions.append({"impl": r["impl"], "op": r["op"], "size": r["size"],
+                                "baseline_p50_ms": b["p50_ms"], "p50_ms": r["p50_ms"], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SM2 实现的基准测试与差分一致性检查")
+    parser.add_argument("--impl", default="basic,optimized,poc", help="逗号分隔：basic,optimized,poc")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="逗号分隔：" + ",".join(OPERATIONS))
+    parser.add_argument("--sizes", default="32,1024,65536", help="消息长度（字节），逗号分隔")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--diff-trials", type=int, default=5, help="差分检查的轮数，0 表示跳过")
+    parser.add_argument("--output", help="JSON 结果输出文件（默认输出到 stdout）")
+    parser.add_argument("--baseline", help="基线 JSON；给出时进入回退检测模式")
+    parser.add_argument("--threshold", type=float, default=0.10, help="允许的 p50 变慢比例")
+    args = parser.parse_args(argv)
+
+    impls = [s for s in args.impl.split(",") if s]
+    ops = [s for s in args.ops.split(",") if s]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    for name in impls:
+        if name not in IMPLEMENTATIONS:
+            parser.error(f"unknown implementation: {name}")
+    for op in ops:
+        if op not in OPERATIONS:
+            parser.error(f"unknown operation: {op}")
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+        },
+        "results": run_benchmarks(impls, ops, sizes, args.iterations, args.warmup),
+    }
+    if args.diff_trials:
+        report["differential"] = differential_check(args.diff_trials, sizes)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare_with_baseline(report["results"], json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if report.get("differential", {}).get("failures"):
+        return 2
+    if report.get("regressions"):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import random
+import time
+
+import numpy as np
+
+from lattice_reduction import bkz, lll
+
+# 隐藏数问题（HNP）：每条签名给出 k_i ≡ t_i·d + c_i (mod n)，且已知 k_i 的部分比特。
+#   SM2:   s = (1 + d)^(-1)·(k - r·d)  =>  k = s + (s + r)·d
+#   ECDSA: s = k^(-1)·(e + r·d)        =>  k = s^(-1)·e + s^(-1)·r·d
+# 已知高位（或 RNG 偏置导致高位为 0）时 k_i = a_i + b_i，已知低位时 k_i = 2^l·b_i + a_i，
+# 两种情况下未知部分都满足 b_i ≡ T_i·d + U_i (mod n)，0 ≤ b_i < 2^(N - l)。
+
+
+def sm2_relation(r, s, n):
+    return (s + r) % n, s % n
+
+
+def ecdsa_relation(e, r, s, n):
+    w = pow(s, -1, n)
+    return r * w % n, e * w % n
+
+
+def samples_needed(bits, nbits=256):
+    """LLL 能稳定求解所需的大致签名条数"""
+    return -(-nbits * 5 // (4 * bits))
+
+
+def _hidden_parts(relations, leaks, n, bits, kind):
+    nbits = n.bit_length()
+    if kind == "msb":
+        shift = nbits - bits
+        return [(t, (c - (a << shift)) % n) for (t, c), a in zip(relations, leaks)]
+    if kind == "lsb":
+        inv = pow(1 << bits, -1, n)
+        return [(t * inv % n, (c - a) * inv % n) for (t, c), a in zip(relations, leaks)]
+    raise ValueError(f"unknown leak kind: {kind}")
+
+
+def hnp_basis(parts, n, bound):
+    """以第 0 条关系消去 d 后的嵌入格（整数基）。
+
+    b_i = A_i·b_0 + C_i (mod n)，A_i = T_i/T_0，C_i = U_i - A_i·U_0；把 b_i 居中为
+    b_i - H（H = bound/2），目标向量 (b_1 - H, ..., b_{m-1} - H, b_0 - H, H) 的每个分量都不超过 H。
+    """
+    (t0, u0), rest = parts[0], parts[1:]
+    t0_inv = pow(t0, -1, n)
+    H = bound // 2
+    m = len(rest)
+    A = [t * t0_inv % n for t, _ in rest]
+    C = [(u - a * u0 + (a - 1) * H) % n for a, (_, u) in zip(A, rest)]
+    B = np.zeros((m + 2, m + 2), dtype=object)
+    for i in range(m):
+        B[i, i] = n
+    B[m, :m] = A
+    B[m, m] = 1
+    B[m + 1, :m] = C
+    B[m + 1, m + 1] = H
+    return B
+
+
+def _candidates(reduced, parts, n, bound):
+    """从约化基中嵌入坐标为 ±H 的行读出 b_0，换算成私钥候选"""
+    t0, u0 = parts[0]
+    t0_inv = pow(t0, -1, n)
+    H = bound // 2
+    for row in reduced:
+        if row[-1] == H:
+            b0 = row[-2] + H
+        elif row[-1] == -H:
+            b0 = H - row[-2]
+        else:
+            continue
+        yield (b0 - u0) * t0_inv % n
+
+
+def solve_hnp(relations, leaks, n, bits, check, kind="msb", block_size=0):
+    """由 k_i ≡ t_i·d + c_i 与每条签名泄露的 bits 个比特求 d，check(d) 为真才返回，失败返回 None。
+
+    先做 LLL；block_size > 0 且 LLL 未得到解时继续做 BKZ-block_size。
+    """
+    parts = _hidden_parts(relations, leaks, n, bits, kind)
+    bound = 1 << (n.bit_length() - bits)
+    reduced = lll(hnp_basis(parts, n, bound))
+    d = next((d for d in _candidates(reduced, parts, n, bound) if check(d)), None)
+    if d is None and block_size:
+        reduced = bkz(reduced, block_size)
+        d = next((d for d in _candidates(reduced, parts, n, bound) if check(d)), None)
+    return d
+
+
+def recover_sm2_key(sm2, public_key, signatures, bits, kind="msb", block_size=0):
+    """signatures 为 [(r, s, leak)]，leak 为 k 的已知高位（kind="msb"）或低位（kind="lsb"）"""
+    n = sm2.n
+    relations = [sm2_relation(r, s, n) for r, s, _ in signatures]
+    leaks = [leak for _, _, leak in signatures]
+    return solve_hnp(relations, leaks, n, bits, lambda d: sm2._point_mul(d, sm2.G) == public_key,
+                     kind, block_size)
+
+
+def recover_ecdsa_key(curve, public_key, signatures, bits, kind="msb", block_size=0):
+    """signatures 为 [(e, r, s, leak)]，curve 需提供 n、G 与 mul"""
+    n = curve.n
+    relations = [ecdsa_relation(e, r, s, n) for e, r, s, _ in signatures]
+    leaks = [leak for _, _, _, leak in signatures]
+    return solve_hnp(relations, leaks, n, bits, lambda d: curve.mul(d, curve.G) == public_key,
+                     kind, block_size)
+
+
+if __name__ == "__main__":
+    from SM2_POC import SM2
+
+    sm2 = SM2()
+    n = sm2.n
+    nbits = n.bit_length()
+    private_key, public_key = sm2.generate_keypair()
+
+    for bits, kind in ((8, "msb"), (6, "msb"), (8, "lsb")):
+        signatures = []
+        while len(signatures) < samples_needed(bits, nbits):
+            k = random.randint(1, n - 1)
+            sig = sm2.sign_specific_k(private_key, f"hnp-{len(signatures)}", k)
+            if sig:
+                leak = k >> (nbits - bits) if kind == "msb" else k & ((1 << bits) - 1)
+                signatures.append((sig[0], sig[1], leak))
+        t1 = time.time()
+        d = recover_sm2_key(sm2, public_key, signatures, bits, kind)
+        t2 = time.time()
+        print(f"泄露 {bits} 位 ({kind}), {len(signatures)} 条签名: {(t2 - t1) * 1000:.2f} ms, "
+              f"恢复私钥正确: {d == private_key}")
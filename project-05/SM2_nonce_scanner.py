@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时用 sorted 找重复指纹
+    np = None
+
+from SM2_optimized import SM2, N
+
+# 记录格式：每行 "pubkey e r s"，pubkey 为 SEC1 编码的十六进制串，e/r/s 为十六进制整数；
+# 空行与 # 开头的行跳过。
+#
+# 由 r = (e + x1) mod n 可从每条签名得到 x1 = (r - e) mod n，即 kG 的 x 坐标；
+# k 相同（或互为相反数）的签名 x1 相同。索引只保存 x1 的低 64 位指纹和记录位置，
+# 每条记录 20 字节；按指纹分片，每一遍只为一个分片建索引，内存占用与分片数成反比。
+# 格式不对的行（字段数不是 4、十六进制非法）跳过，并以 "文件:行号: 原因" 报告。
+FP_MASK = (1 << 64) - 1
+
+# 每个 worker 进程持有一个 SM2 实例，用于校验恢复出的私钥
+_worker_sm2 = None
+
+
+def _get_sm2():
+    global _worker_sm2
+    if _worker_sm2 is None:
+        _worker_sm2 = SM2()
+    return _worker_sm2
+
+
+def parse_record(line):
+    """解析一行记录；空行与注释行返回 None，格式不对时抛出 ValueError"""
+    fields = line.split()
+    if not fields or fields[0].startswith(b'#'):
+        return None
+    if len(fields) != 4:
+        raise ValueError(f"expected 4 fields, got {len(fields)}")
+    try:
+        return bytes.fromhex(fields[0].decode()), int(fields[1], 16), int(fields[2], 16), int(fields[3], 16)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("invalid hex field") from None
+
+
+def nonce_commitment(e, r):
+    return (r - e) % N
+
+
+# --------- 第一遍：分片指纹索引 ---------
+def _index_shard(paths, shard, shards):
+    """扫描全部文件，只为 fp % shards == shard 的记录保存 (指纹, 文件号, 偏移)。
+
+    每一遍都会读到全部行，格式错误只在第 0 个分片收集一次，返回 [(path, 行号, 原因)]。
+    """
+    fps, files, offsets = array('Q'), array('I'), array('Q')
+    errors = []
+    for file_no, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            offset = 0
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = parse_record(line)
+                except ValueError as exc:
+                    if shard == 0:
+                        errors.append((path, line_no, str(exc)))
+                    record = None
+                if record is not None:
+                    fp = nonce_commitment(record[1], record[2]) & FP_MASK
+                    if fp % shards == shard:
+                        fps.append(fp)
+                        files.append(file_no)
+                        offsets.append(offset)
+                offset += len(line)
+    return fps, files, offsets, errors
+
+
+def _duplicate_positions(fps):
+    """返回指纹出现不止一次的记录下标"""
+    if np is not None:
+        keys = np.frombuffer(fps, dtype=np.uint64)
+        order = np.argsort(keys, kind='stable')
+        ordered = keys[order]
+        dup = ordered[1:] == ordered[:-1]
+        mask = np.zeros(len(keys), dtype=bool)
+        mask[1:] |= dup
+        mask[:-1] |= dup
+        return order[mask].tolist()
+    order = sorted(range(len(fps)), key=fps.__getitem__)
+    result = []
+    for a, b in zip(order, order[1:]):
+        if fps[a] == fps[b]:
+            if not result or result[-1] != a:
+                result.append(a)
+            result.append(b)
+    return result
+
+
+# --------- 第二遍：回读候选记录并恢复私钥 ---------
+def _read_records(paths, locations):
+    handles = {}
+    try:
+        for file_no, offset in sorted(locations):
+            f = handles.get(file_no)
+            if f is None:
+                f = handles[file_no] = open(paths[file_no], 'rb')
+            f.seek(offset)
+            yield parse_record(f.readline())
+    finally:
+        for f in handles.values():
+            f.close()
+
+
+def recover_group(sm2, records):
+    """对 x1 相同的一组签名恢复私钥，返回 {公钥编码: d}，只保留 d·G 与公钥一致的结果。
+
+    SM2 签名满足 k = s + (s + r)·d (mod n)。同一公钥的两次签名 k 相同或互为相反数时
+    直接解出 d；组内任一私钥已知即可得到 k，再解出其余公钥的私钥。
+    """
+    n = sm2.n
+    by_key = {}
+    for pub, e, r, s in dict.fromkeys(records):
+        by_key.setdefault(pub, []).append((r, s))
+    keys = {}
+
+    def accept(pub, num, den):
+        if den % n == 0:
+            return False
+        d = num * pow(den, -1, n) % n
+        try:
+            ok = d != 0 and sm2._point_mul(d, sm2.G) == sm2.deserialize_public_key(pub)
+        except ValueError:
+            return False
+        if ok:
+            keys[pub] = d
+        return ok
+
+    for pub, sigs in by_key.items():
+        if len(sigs) < 2:
+            continue
+        (r1, s1), (r2, s2) = sigs[:2]
+        # k1 = k2 或 k1 = -k2
+        accept(pub, s2 - s1, s1 + r1 - s2 - r2) or accept(pub, -(s1 + s2), s1 + r1 + s2 + r2)
+
+    pending = [pub for pub in keys]
+    while pending:
+        r, s = by_key[pending[-1]][0]
+        k = (s + (s + r) * keys[pending.pop()]) % n
+        for other, sigs in by_key.items():
+            if other in keys:
+                continue
+            r2, s2 = sigs[0]
+            if accept(other, k - s2, s2 + r2) or accept(other, n - k - s2, s2 + r2):
+                pending.append(other)
+    return keys
+
+
+def scan_shard(paths, shard, shards):
+    """处理一个分片，返回 (该分片内的全部碰撞结果, 格式错误的行)"""
+    fps, files, offsets, errors = _index_shard(paths, shard, shards)
+    positions = _duplicate_positions(fps)
+    del fps
+    groups = {}
+    for record in _read_records(paths, [(files[i], offsets[i]) for i in positions]):
+        groups.setdefault(nonce_commitment(record[1], record[2]), []).append(record)
+
+    sm2 = _get_sm2()
+    findings = []
+    for x1, records in groups.items():
+        if len(set(records)) < 2:
+            continue  # 指纹碰撞或重复记录
+        findings.append({
+            "x1": x1,
+            "records": records,
+            "keys": recover_group(sm2, records),
+        })
+    return findings, errors
+
+
+def scan(paths, shards=16, workers=None, errors=None):
+    """逐分片扫描签名文件，产出 x1 相同（k 重用或 k 互为相反数）的签名组。
+
+    每个结果为 {"x1", "records": [(pub, e, r, s)], "keys": {pub: d}}；
+    workers > 1 时各分片分发到多个进程并行处理。
+    格式不对的行被跳过：给出 errors 列表时追加 "文件:行号: 原因"，否则打印到 stderr。
+    """
+    paths = list(paths)
+
+    def report(bad_lines):
+        for path, line_no, reason in bad_lines:
+            message = f"{path}:{line_no}: {reason}"
+            if errors is None:
+                print(message, file=sys.stderr)
+            else:
+                errors.append(message)
+
+    if not workers or workers <= 1:
+        for shard in range(shards):
+            findings, bad_lines = scan_shard(paths, shard, shards)
+            report(bad_lines)
+            yield from findings
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for findings, bad_lines in executor.map(partial(scan_shard, paths, shards=shards), range(shards)):
+            report(bad_lines)
+            yield from findings
+
+
+def _finding_json(finding):
+    return json.dumps({
+        "x1": hex(finding["x1"]),
+        "signatures": len(finding["records"]),
+        "public_keys": sorted({pub.hex() for pub, _, _, _ in finding["records"]}),
+        "recovered": {pub.hex(): hex(d) for pub, d in finding["keys"].items()},
+    })
+
+
+def _write_demo_corpus(path, count):
+    """随机背景记录 + 若干组植入的 k 重用签名，返回植入的私钥集合"""
+    sm2 = SM2()
+    n = sm2.n
+    planted = set()
+
+    def sign_with_k(d, k, e):
+        x1 = sm2._point_mul(k, sm2.G)[0]
+        r = (e + x1) % n
+        return r, pow(1 + d, -1, n) * (k - r * d) % n
+
+    lines = []
+    # 同一用户重用 k；另一用户使用相同 k 与相反数 -k
+    for _ in range(4):
+        (dA, pubA), (dB, pubB) = sm2.generate_keypair(), sm2.generate_keypair()
+        k = random.randrange(1, n)
+        for d, pub, kk in ((dA, pubA, k), (dA, pubA, k), (dB, pubB, n - k)):
+            e = random.randrange(n)
+            r, s = sign_with_k(d, kk, e)
+            lines.append(f"{sm2.serialize_public_key(pub, compressed=True).hex()} {e:x} {r:x} {s:x}\n")
+        planted.update((dA, dB))
+    # 背景记录只需格式正确，扫描器只会回读指纹重复的记录
+    pub_hex = sm2.serialize_public_key(sm2.generate_keypair()[1], compressed=True).hex()
+    for _ in range(count - len(lines)):
+        lines.append(f"{pub_hex} {random.getrandbits(256):x} {random.getrandbits(256):x} {random.getrandbits(256):x}\n")
+    random.shuffle(lines)
+    with open(path, 'w') as f:
+        f.write("# pubkey e r s\n")
+        f.writelines(lines)
+    return planted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SM2 签名语料的 k 重用扫描")
+    parser.add_argument("paths", nargs="*", help="签名记录文件；不给出时运行演示")
+    parser.add_argument("--shards", type=int, default=16, help="分片数，越大单遍内存越小")
+    parser.add_argument("--workers", type=int, default=1, help="并行处理分片的进程数")
+    parser.add_argument("--demo-records", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    if args.paths:
+        for finding in scan(args.paths, args.shards, args.workers):
+            print(_finding_json(finding))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        planted = _write_demo_corpus(path, args.demo_records)
+        t1 = time.time()
+        findings = list(scan([path], args.shards, args.workers))
+        t2 = time.time()
+    recovered = {d for f in findings for d in f["keys"].values()}
+    print(f"扫描 {args.demo_records} 条记录: {(t2 - t1) * 1000:.2f} ms, 碰撞组 {len(findings)} 个")
+    print(f"恢复私钥 {len(recovered)} 个, 与植入私钥一致: {recovered == planted}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,35 @@
+import os
 import random
 import hashlib
+import struct
+import sys
+import threading
 import time
+import weakref
+from collections import OrderedDict, deque
+from functools import lru_cache
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时退回到大整数按字异或
+    np = None
+
+from SM3_vectorized import SM3, sm3_many
+from op_counter import op_cost
+
+# OpenSSL 提供 SM3 时优先使用 C 实现，否则使用纯 Python / NumPy 实现（不再回退到 SHA-256）
+try:
+    hashlib.new('sm3')
+    HASHLIB_SM3 = True
+except ValueError:
+    HASHLIB_SM3 = False
+
+
+def _sm3_new():
+    if HASHLIB_SM3:
+        return hashlib.new('sm3')
+    return SM3()
 
 # SM2推荐曲线参数
 P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
@@ -9,72 +38,453 @@ B = 0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93
 N = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123
 Gx = 0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7
 Gy = 0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0
+# p ≡ 3 (mod 4)，平方根可直接取 (p+1)/4 次幂
+SQRT_EXP = (P + 1) // 4
+
+@lru_cache(maxsize=1024)
+def _decode_point(data):
+    """解析 0x04 未压缩 / 0x02、0x03 压缩编码的点并校验其在曲线上；结果缓存最近 1024 个。"""
+    if len(data) == 65 and data[0] == 0x04:
+        x = int.from_bytes(data[1:33], 'big')
+        y = int.from_bytes(data[33:], 'big')
+    elif len(data) == 33 and data[0] in (0x02, 0x03):
+        x = int.from_bytes(data[1:], 'big')
+        if x >= P:
+            raise ValueError("point is not on the curve")
+        y = pow((x * x + A) * x + B, SQRT_EXP, P)
+        if (y & 1) != (data[0] & 1):
+            y = P - y
+    else:
+        raise ValueError("Invalid point encoding")
+    if x >= P or y >= P or (y * y - (x * x + A) * x - B) % P != 0:
+        raise ValueError("point is not on the curve")
+    return (x, y)
+
+
+# 基点 G 的预计算表在进程内只构建一次，由所有 SM2 实例共享
+COMB_CACHE_MAGIC = b"SM2COMB"
+COMB_CACHE_VERSION = 2  # 2：文件末尾附 SHA-256 摘要
+COMB_CACHE_SPOT_CHECKS = 8
+_shared_tables = {}
+_shared_tables_lock = threading.Lock()
+
+
+class PointTableCache:
+    """热点公钥的 wNAF 奇数倍预计算表缓存（线程安全，LRU 淘汰）。
+
+    一个点被查询满 hot_threshold 次后才建表，避免一次性的公钥挤占缓存；
+    所有表的估算内存之和不超过 max_bytes。
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, hot_threshold=2, width=5, max_tracked=65536):
+        self.max_bytes = max_bytes
+        self.hot_threshold = hot_threshold
+        self.width = width
+        self.max_tracked = max_tracked
+        self._tables = OrderedDict()   # point -> (table, nbytes)
+        self._seen = OrderedDict()     # 尚未建表的点 -> 查询次数
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, point):
+        """返回 (table, hot)：命中时 table 非空；hot 为 True 表示调用方应建表并 put()。"""
+        with self._lock:
+            entry = self._tables.get(point)
+            if entry is not None:
+                self._tables.move_to_end(point)
+                self.hits += 1
+                return entry[0], False
+            self.misses += 1
+            count = self._seen.pop(point, 0) + 1
+            if count >= self.hot_threshold:
+                return None, True
+            self._seen[point] = count
+            if len(self._seen) > self.max_tracked:
+                self._seen.popitem(last=False)
+            return None, False
+
+    def put(self, point, table):
+        nbytes = sys.getsizeof(table) + sum(
+            sys.getsizeof(pt) + sum(sys.getsizeof(c) for c in pt) for pt in table)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if point in self._tables:
+                return
+            self._tables[point] = (table, nbytes)
+            self.bytes_used += nbytes
+            while self.bytes_used > self.max_bytes:
+                _, (_, freed) = self._tables.popitem(last=False)
+                self.bytes_used -= freed
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self._seen.clear()
+            self.bytes_used = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._tables),
+                "bytes": self.bytes_used,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# fork 之后子进程必须丢弃继承来的 nonce，否则父子进程会用同一个 k 签名
+_nonce_pools = weakref.WeakSet()
+
+
+def _reset_nonce_pools_after_fork():
+    for pool in list(_nonce_pools):
+        pool._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_nonce_pools_after_fork)
+
+
+class NoncePool:
+    """离线/在线签名的 (k, x1) 预计算池，由后台线程补充。
+
+    深度低于 low_watermark 时后台线程开始按批计算 k*G（每批共用一次模逆），
+    补到 high_watermark 为止。每个 nonce 出队即销毁，绝不重复使用；
+    池空时 take() 现场计算并记一次 starvation。
+    """
+
+    def __init__(self, sm2, low_watermark=64, high_watermark=1024, batch_size=64):
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("require 0 <= low_watermark < high_watermark")
+        self.sm2 = sm2
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.batch_size = batch_size
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._pid = os.getpid()
+        self._thread = None
+        self.produced = 0
+        self.consumed = 0
+        self.starvations = 0
+        _nonce_pools.add(self)
+        self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._fill_loop, name="sm2-nonce-pool", daemon=True)
+        self._thread.start()
+
+    def _fill_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._items) >= self.low_watermark:
+                    self._cond.wait()
+                if self._closed or self._pid != os.getpid():
+                    return
+                need = self.high_watermark - len(self._items)
+            while need > 0 and not self._closed:
+                size = min(self.batch_size, need)
+                ks = [random.randint(1, self.sm2.n - 1) for _ in range(size)]
+                points = self.sm2._batch_to_affine([self.sm2._point_mul_comb(k) for k in ks])
+                with self._cond:
+                    if self._pid != os.getpid():
+                        return
+                    self._items.extend((k, x1) for k, (x1, _) in zip(ks, points))
+                    self.produced += size
+                need -= size
+
+    def _after_fork(self):
+        # 子进程：清空继承的 nonce，线程不会随 fork 复制，需要重新启动
+        self._cond = threading.Condition()
+        self._items = deque()
+        self._pid = os.getpid()
+        if not self._closed:
+            self._start()
+
+    def take(self):
+        """取出一个从未使用过的 (k, x1)。"""
+        if self._pid != os.getpid():
+            self._after_fork()
+        with self._cond:
+            if self._items:
+                item = self._items.popleft()
+                self.consumed += 1
+                if len(self._items) < self.low_watermark:
+                    self._cond.notify()
+                return item
+            self.starvations += 1
+            self._cond.notify()
+        k = random.randint(1, self.sm2.n - 1)
+        x1, _ = self.sm2._point_mul(k, self.sm2.G)
+        return k, x1
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "produced": self.produced,
+                "consumed": self.consumed,
+                "starvations": self.starvations,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+
+# GB/T 32918 未指定用户身份时的默认 ID
+DEFAULT_USER_ID = b"1234567812345678"
+
+
+class SM2PublicKey:
+    """带缓存的 SM2 公钥：Z_A、吸收 Z_A 之后的哈希状态与编码后的公钥字节。
+
+    每次签名/验签只需 copy() 哈希状态再吸收消息，e = SM3(Z_A || M)。
+    """
+
+    __slots__ = ("point", "user_id", "encoded", "z_a", "_hash_state")
+
+    def __init__(self, sm2, point, user_id=DEFAULT_USER_ID):
+        if isinstance(user_id, str):
+            user_id = user_id.encode()
+        self.point = point
+        self.user_id = user_id
+        self.encoded = sm2.serialize_public_key(point)
+        self.z_a = sm2._hash((len(user_id) * 8).to_bytes(2, 'big') + user_id
+                             + sm2.a.to_bytes(32, 'big') + sm2.b.to_bytes(32, 'big')
+                             + sm2.G[0].to_bytes(32, 'big') + sm2.G[1].to_bytes(32, 'big')
+                             + self.encoded[1:])
+        self._hash_state = _sm3_new()
+        self._hash_state.update(self.z_a)
+
+    # 哈希对象不能 pickle（SM2Pool 需要把密钥传给 worker 进程）：只传 z_a，接收端重建哈希状态
+    def __getstate__(self):
+        return (self.point, self.user_id, self.encoded, self.z_a)
+
+    def __setstate__(self, state):
+        self.point, self.user_id, self.encoded, self.z_a = state
+        self._hash_state = _sm3_new()
+        self._hash_state.update(self.z_a)
+
+    def digest(self, msg):
+        h = self._hash_state.copy()
+        h.update(msg)
+        return int.from_bytes(h.digest(), 'big')
+
+
+class SM2PrivateKey:
+    """带缓存的 SM2 私钥：d、(1 + d)^-1 mod n 以及对应的 SM2PublicKey。"""
+
+    __slots__ = ("d", "inv_1_plus_d", "public_key")
+
+    def __init__(self, sm2, d, user_id=DEFAULT_USER_ID, public_point=None):
+        self.d = d
+        self.inv_1_plus_d = sm2._mod_inverse(1 + d, sm2.n)
+        if public_point is None:
+            public_point = sm2._point_mul(d, sm2.G)
+        self.public_key = SM2PublicKey(sm2, public_point, user_id)
+
+    def digest(self, msg):
+        return self.public_key.digest(msg)
+
+
+class _KDFStream:
+    """按字节偏移连续取出 KDF 输出，供流式加解密使用。
+
+    每次读取的长度任意（文件、管道、套接字都可能短读），上一个 32 字节块
+    未用完的部分留给下一次，保证密钥流与一次性 _kdf() 的结果逐字节一致。
+    """
+
+    def __init__(self, sm2, Z):
+        self.sm2 = sm2
+        self.Z = Z
+        self.ct = 1
+        self.tail = b''
+        self.nonzero = False
+
+    def take(self, n):
+        count = max(0, (n - len(self.tail) + 31) // 32)
+        t = self.tail + self.sm2._kdf_blocks(self.Z, self.ct, count)
+        self.ct += count
+        self.tail = t[n:]
+        t = t[:n]
+        self.nonzero = self.nonzero or t.count(0) != n
+        return t
+
 
 class SM2:
-    def __init__(self):
+    OP_ENTRY_POINTS = ("generate_keypair", "encrypt", "decrypt", "encrypt_stream", "decrypt_stream",
+                       "sign", "sign_recoverable", "verify", "verify_batch")
+
+    def __init__(self, comb_teeth=8, comb_tables=4, comb_cache=None, point_cache=None,
+                 variable_base="wnaf", wnaf_width=5):
+        """comb_teeth / comb_tables 决定 G 的梳状表大小：
+        comb_tables * (2^comb_teeth - 1) 个仿射点（默认 4 * 255 点，约 64 KB；
+        teeth=10, tables=8 约 512 KB；teeth=12, tables=8 约 2 MB）。
+        comb_cache 为可选的表缓存文件路径，未给出时读取环境变量 SM2_COMB_CACHE。
+        variable_base 为加密时 k·P_B 的默认算法："wnaf"（更快）或 "ladder"
+        （Montgomery 梯子，运算序列与标量无关）。解密中 d·C1 的标量是长期私钥，
+        不受此项影响，默认总用梯子法；各加解密接口均可用 method 按次指定。
+        """
         self.p = P
         self.a = A
         self.b = B
         self.n = N
         self.G = (Gx, Gy)
         self.window_size = 4
-        self.precompute_table = self._precompute_fixed_point(self.G, self.window_size)
+        self.comb_teeth = comb_teeth
+        self.comb_tables = comb_tables
+        self.comb_cache = comb_cache if comb_cache is not None else os.environ.get("SM2_COMB_CACHE")
+        # 可传入 PointTableCache 在多个实例间共享，或传 False 关闭
+        if point_cache is None:
+            point_cache = PointTableCache()
+        self.point_cache = point_cache or None
+        self.nonce_pool = None
+        if variable_base not in ("wnaf", "ladder"):
+            raise ValueError(f"unknown variable_base method: {variable_base}")
+        self.variable_base = variable_base
+        self.wnaf_width = wnaf_width
+
+    # --------- 共享预计算表（懒加载，每进程一次） ---------
+    def _shared_table(self, key, build):
+        table = _shared_tables.get(key)
+        if table is None:
+            with _shared_tables_lock:
+                table = _shared_tables.get(key)
+                if table is None:
+                    table = build()
+                    _shared_tables[key] = table
+        return table
+
+    @property
+    def precompute_table(self):
+        return self._shared_table(("odd", self.window_size),
+                                  lambda: self._precompute_fixed_point(self.G, self.window_size))
+
+    @property
+    def comb_table(self):
+        return self._shared_table(("comb", self.comb_teeth, self.comb_tables), self._load_or_build_comb)
 
     # --------- 椭圆曲线基础与点乘（雅可比+预计算+窗口法） ---------
+    # SM2 的 a = p - 3，倍点使用 a = -3 专用公式；预计算表一律保存为仿射点
+    # (x, y)（即 Z = 1），与累加器相加时走混合加法。中间结果只在必要处取模。
+    @op_cost({"inv": 1})
     def _mod_inverse(self, a, p):
         return pow(a, -1, p)
 
+    @op_cost(lambda values: {"mul": max(3 * len(values) - 2, 0)})
+    def _batch_inverse(self, values):
+        # Montgomery 同时求逆：n 个元素只做一次模逆，外加 3n - 2 次乘法
+        p = self.p
+        prefix = []
+        acc = 1
+        for v in values:
+            prefix.append(acc)
+            acc = acc * v % p
+        inv = self._mod_inverse(acc, p)
+        result = [0] * len(values)
+        for i in reversed(range(len(values))):
+            result[i] = inv * prefix[i] % p
+            inv = inv * values[i] % p
+        return result
+
+    @op_cost(lambda points: {"mul": 3 * len(points), "sqr": len(points)})
+    def _batch_to_affine(self, points):
+        # 多个雅可比点共用一次模逆归一化为仿射点；无穷远点输出 (0, 0)
+        p = self.p
+        finite = [i for i, pt in enumerate(points) if pt[2] != 0]
+        invs = self._batch_inverse([points[i][2] for i in finite])
+        result = [(0, 0)] * len(points)
+        for i, z_inv in zip(finite, invs):
+            X, Y, _ = points[i]
+            zz = z_inv * z_inv % p
+            result[i] = (X * zz % p, Y * zz * z_inv % p)
+        return result
+
+    @op_cost(lambda P, Q: {"add": 1, "mul": 12, "sqr": 4} if P[2] and Q[2] else {})
     def _jacobian_add(self, P, Q):
         if P[2] == 0:
             return Q
         if Q[2] == 0:
             return P
 
+        p = self.p
         X1, Y1, Z1 = P
         X2, Y2, Z2 = Q
 
-        Z1Z1 = (Z1 * Z1) % self.p
-        Z2Z2 = (Z2 * Z2) % self.p
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        U1 = X1 * Z2Z2 % p
+        S1 = Y1 * Z2 % p * Z2Z2 % p
+        H = (X2 * Z1Z1 - U1) % p
+        R = (Y2 * Z1 % p * Z1Z1 - S1) % p
+
+        if H == 0:
+            if R == 0:
+                return self._jacobian_double(P)
+            return (0, 1, 0)
 
-        U1 = (X1 * Z2Z2) % self.p
-        U2 = (X2 * Z1Z1) % self.p
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - S1 * HHH) % p
+        Z3 = H * Z1 % p * Z2 % p
+        return (X3, Y3, Z3)
 
-        S1 = (Y1 * Z2 * Z2Z2) % self.p
-        S2 = (Y2 * Z1 * Z1Z1) % self.p
+    @op_cost(lambda P, Q: {"add": 1, "mul": 8, "sqr": 3} if P[2] else {})
+    def _jacobian_add_mixed(self, P, Q):
+        # P 为雅可比点，Q 为仿射点 (x, y)：省去 Z2 相关的 4 次乘法
+        X1, Y1, Z1 = P
+        if Z1 == 0:
+            return (Q[0], Q[1], 1)
 
-        H = (U2 - U1) % self.p
-        R = (S2 - S1) % self.p
+        p = self.p
+        x2, y2 = Q
+        Z1Z1 = Z1 * Z1 % p
+        H = (x2 * Z1Z1 - X1) % p
+        R = (y2 * Z1 % p * Z1Z1 - Y1) % p
 
         if H == 0:
             if R == 0:
                 return self._jacobian_double(P)
-            else:
-                return (0, 1, 0)
-
-        HH = (H * H) % self.p
-        HHH = (H * HH) % self.p
-        V = (U1 * HH) % self.p
-
-        X3 = (R * R - HHH - 2 * V) % self.p
-        Y3 = (R * (V - X3) - S1 * HHH) % self.p
-        Z3 = (H * Z1 * Z2) % self.p
+            return (0, 1, 0)
 
+        HH = H * H % p
+        HHH = H * HH % p
+        V = X1 * HH % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - Y1 * HHH) % p
+        Z3 = Z1 * H % p
         return (X3, Y3, Z3)
 
+    @op_cost(lambda P: {"dbl": 1, "mul": 4, "sqr": 4} if P[2] and P[1] else {})
     def _jacobian_double(self, P):
+        # a = -3：M = 3X^2 + aZ^4 = 3(X - Z^2)(X + Z^2)
         X1, Y1, Z1 = P
         if Z1 == 0 or Y1 == 0:
             return (0, 1, 0)
 
-        YY = (Y1 * Y1) % self.p
-        S = (4 * X1 * YY) % self.p
-        M = (3 * X1 * X1 + self.a * ((Z1 * Z1) % self.p) ** 2) % self.p
-        X3 = (M * M - 2 * S) % self.p
-        Y3 = (M * (S - X3) - 8 * (YY * YY % self.p)) % self.p
-        Z3 = (2 * Y1 * Z1) % self.p
-
+        p = self.p
+        delta = Z1 * Z1 % p
+        gamma = Y1 * Y1 % p
+        beta = X1 * gamma % p
+        M = 3 * (X1 - delta) * (X1 + delta) % p
+        X3 = (M * M - 8 * beta) % p
+        Y3 = (M * (4 * beta - X3) - 8 * gamma * gamma) % p
+        Z3 = 2 * Y1 * Z1 % p
         return (X3, Y3, Z3)
 
+    @op_cost(lambda P: {"mul": 3, "sqr": 1} if P[2] else {})
     def _jacobian_to_affine(self, P):
         X, Y, Z = P
         if Z == 0:
@@ -85,43 +495,9 @@ class SM2:
         y = (Y * Z_inv_sq * Z_inv) % self.p
         return (x, y)
 
-    def _jacobian_mul_scalar(self, k, P):
-        R = (0, 1, 0)
-        Q = P
-        for i in reversed(range(k.bit_length())):
-            R = self._jacobian_double(R)
-            if (k >> i) & 1:
-                R = self._jacobian_add(R, Q)
-        return R
-
     def _precompute_fixed_point(self, base, window_size):
-        base_jac = (base[0], base[1], 1)
-        table = []
-        max_idx = 2 ** window_size
-        for i in range(1, max_idx, 2):
-            pt = self._jacobian_mul_scalar(i, base_jac)
-            table.append(pt)
-        return table
-
-    def _point_mul_fixed(self, k, table, window_size):
-        R = (0, 1, 0)
-        k_bin = bin(k)[2:]
-        i = 0
-        while i < len(k_bin):
-            if k_bin[i] == '0':
-                R = self._jacobian_double(R)
-                i += 1
-            else:
-                j = min(window_size, len(k_bin) - i)
-                while j > 1 and int(k_bin[i:i+j], 2) % 2 == 0:
-                    j -= 1
-                val = int(k_bin[i:i+j], 2)
-                idx = (val - 1) // 2
-                for _ in range(j):
-                    R = self._jacobian_double(R)
-                R = self._jacobian_add(R, table[idx])
-                i += j
-        return R
+        # 奇数倍 1, 3, ..., 2^w - 1 倍基点，仿射形式
+        return self._odd_multiples(base, window_size + 1)
 
     def _montgomery_ladder(self, k, P):
         R0 = (0, 1, 0)
@@ -136,30 +512,259 @@ class SM2:
                 R1 = self._jacobian_double(R1)
         return R0
 
-    def _point_mul(self, k, P):
+    # --------- Lim–Lee 梳状法固定基点乘 ---------
+    def _comb_shape(self, w=None, v=None):
+        # 256 位标量排成 w 行 d 列，d = v * e，每张表负责 e 列
+        w = w or self.comb_teeth
+        v = v or self.comb_tables
+        rows = (self.n.bit_length() + w - 1) // w
+        e = (rows + v - 1) // v
+        return w, v, e, v * e
+
+    def _build_comb(self, base=None, w=None, v=None):
+        # 默认为 G 的表；批量验签时也为同一公钥的多条签名临时建表
+        base = base or self.G
+        w, v, e, d = self._comb_shape(w, v)
+        bases = [(base[0], base[1], 1)]
+        for _ in range(w - 1):
+            B = bases[-1]
+            for _ in range(d):
+                B = self._jacobian_double(B)
+            bases.append(B)
+
+        # T_0[u] = sum_{bit i of u} 2^(i*d) base
+        first = [(0, 1, 0)] * (1 << w)
+        for u in range(1, 1 << w):
+            hb = u.bit_length() - 1
+            first[u] = self._jacobian_add(first[u ^ (1 << hb)], bases[hb])
+        # T_j[u] = 2^(j*e) T_0[u]
+        tables = [first]
+        for _ in range(1, v):
+            nxt = [(0, 1, 0)]
+            for pt in tables[-1][1:]:
+                for _ in range(e):
+                    pt = self._jacobian_double(pt)
+                nxt.append(pt)
+            tables.append(nxt)
+        flat = self._batch_to_affine([pt for tbl in tables for pt in tbl[1:]])
+        size = (1 << w) - 1
+        return [[None] + flat[j * size:(j + 1) * size] for j in range(v)]
+
+    def _comb_cache_header(self):
+        return (COMB_CACHE_MAGIC + struct.pack(">BHH", COMB_CACHE_VERSION, self.comb_teeth, self.comb_tables)
+                + self.G[0].to_bytes(32, 'big') + self.G[1].to_bytes(32, 'big'))
+
+    def _read_comb_cache(self, path, header):
+        # 缓存文件：header || 表 || SHA-256(header || 表)。截断、损坏或被篡改的文件
+        # 会让 k*G 静默出错，因此摘要不符或抽查失败时返回 None，由调用方重建
+        w, v = self.comb_teeth, self.comb_tables
+        size = (1 << w) - 1
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        body, digest = data[len(header):-32], data[-32:]
+        if (not data.startswith(header) or len(body) != v * size * 64
+                or hashlib.sha256(data[:-32]).digest() != digest):
+            return None
+        tables = []
+        pos = 0
+        for _ in range(v):
+            tbl = [None]
+            for _ in range(size):
+                tbl.append((int.from_bytes(body[pos:pos + 32], 'big'),
+                            int.from_bytes(body[pos + 32:pos + 64], 'big')))
+                pos += 64
+            tables.append(tbl)
+        # 抽查：T_0[1] = G，T_0[3] = T_0[1] + T_0[2]，随机若干项在曲线上
+        first = tables[0]
+        if first[1] != self.G or (w > 1 and self._jacobian_to_affine(
+                self._jacobian_add_mixed((first[1][0], first[1][1], 1), first[2])) != first[3]):
+            return None
+        rng = random.SystemRandom()
+        for _ in range(COMB_CACHE_SPOT_CHECKS):
+            if not self._is_on_curve(tables[rng.randrange(v)][rng.randrange(1, size + 1)]):
+                return None
+        return tables
+
+    def _load_or_build_comb(self):
+        path = self.comb_cache
+        header = self._comb_cache_header()
+        if path and os.path.exists(path):
+            tables = self._read_comb_cache(path, header)
+            if tables is not None:
+                return tables
+
+        tables = self._build_comb()
+        if path:
+            # 先写临时文件再原子替换，避免并发启动的 worker 读到半截文件
+            tmp = f"{path}.{os.getpid()}.tmp"
+            h = hashlib.sha256(header)
+            with open(tmp, 'wb') as f:
+                f.write(header)
+                for tbl in tables:
+                    for x, y in tbl[1:]:
+                        entry = x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+                        h.update(entry)
+                        f.write(entry)
+                f.write(h.digest())
+            os.replace(tmp, path)
+        return tables
+
+    def _point_mul_comb(self, k, tables=None, w=None, v=None):
+        w, v, e, d = self._comb_shape(w, v)
+        tables = tables or self.comb_table
+        row_mask = (1 << d) - 1
+        rows = [(k >> (i * d)) & row_mask for i in range(w)]
+
+        R = (0, 1, 0)
+        for t in reversed(range(e)):
+            R = self._jacobian_double(R)
+            for j in range(v):
+                pos = j * e + t
+                idx = 0
+                for i in range(w):
+                    idx |= ((rows[i] >> pos) & 1) << i
+                if idx:
+                    R = self._jacobian_add_mixed(R, tables[j][idx])
+        return R
+
+    def _point_mul(self, k, P, method=None, cache=True):
         if P == self.G:
-            R_jac = self._point_mul_fixed(k, self.precompute_table, self.window_size)
+            R_jac = self._point_mul_comb(k)
             return self._jacobian_to_affine(R_jac)
-        else:
+        method = method or self.variable_base
+        if method == "ladder":
             R_jac = self._montgomery_ladder(k, P)
-            return self._jacobian_to_affine(R_jac)
+        elif method == "wnaf":
+            R_jac = self._point_mul_wnaf(k, P, cache)
+        else:
+            raise ValueError(f"unknown scalar multiplication method: {method}")
+        return self._jacobian_to_affine(R_jac)
+
+    def _point_mul_wnaf(self, k, P, cache=True):
+        # 有符号 wNAF：热点公钥用缓存表，否则现场计算奇数倍表；
+        # cache=False 用于一次性的点（如密文中的 C1），不占用缓存的计数与容量
+        table = self._cached_point_table(P) if cache else None
+        if table is not None:
+            return self._wnaf_mul(k, table, self.point_cache.width)
+        return self._wnaf_mul(k, self._odd_multiples(P, self.wnaf_width), self.wnaf_width)
+
+    def _cached_point_table(self, P):
+        # 热点公钥返回缓存的奇数倍表（必要时建表），冷点返回 None
+        if self.point_cache is None:
+            return None
+        table, hot = self.point_cache.lookup(P)
+        if hot:
+            table = self._odd_multiples(P, self.point_cache.width)
+            self.point_cache.put(P, table)
+        return table
+
+    # --------- 交错 wNAF 双标量乘 sG + tP（Shamir/Straus） ---------
+    def _wnaf(self, k, w):
+        # 宽度 w 的有符号 NAF，低位在前；非零位为奇数且 |d| < 2^(w-1)
+        digits = []
+        half = 1 << (w - 1)
+        full = 1 << w
+        while k:
+            if k & 1:
+                d = k & (full - 1)
+                if d >= half:
+                    d -= full
+                k -= d
+            else:
+                d = 0
+            digits.append(d)
+            k >>= 1
+        return digits
+
+    def _odd_multiples(self, P, w):
+        # [P, 3P, 5P, ..., (2^(w-1) - 1)P]，批量归一化为仿射点
+        P2 = self._jacobian_double((P[0], P[1], 1))
+        table = [(P[0], P[1], 1)]
+        for _ in range((1 << (w - 2)) - 1):
+            table.append(self._jacobian_add(table[-1], P2))
+        return [(P[0], P[1])] + self._batch_to_affine(table[1:])
+
+    def _wnaf_mul(self, k, table, w):
+        p = self.p
+        R = (0, 1, 0)
+        for d in reversed(self._wnaf(k, w)):
+            R = self._jacobian_double(R)
+            if d:
+                x, y = table[abs(d) >> 1]
+                R = self._jacobian_add_mixed(R, (x, y if d > 0 else p - y))
+        return R
+
+    def _joint_mul(self, s, t, P):
+        """共享同一条倍点链计算 sG + tP，结果保持雅可比坐标。
+
+        G 使用现成的奇数倍预计算表（窗口 4 的表即 1G..15G，可直接作为
+        宽度 5 的 wNAF 表），P 优先使用热点缓存中的表，否则现场构造宽度为
+        wnaf_width 的奇数倍表；负数位利用 -(X, Y, Z) = (X, -Y, Z) 免费得到。
+        """
+        g_digits = self._wnaf(s, self.window_size + 1)
+        p_table = self._cached_point_table(P)
+        if p_table is not None:
+            p_digits = self._wnaf(t, self.point_cache.width)
+        else:
+            p_digits = self._wnaf(t, self.wnaf_width)
+            p_table = self._odd_multiples(P, self.wnaf_width)
+        g_table = self.precompute_table
+        p = self.p
+
+        R = (0, 1, 0)
+        for i in reversed(range(max(len(g_digits), len(p_digits)))):
+            R = self._jacobian_double(R)
+            if i < len(g_digits) and g_digits[i]:
+                d = g_digits[i]
+                x, y = g_table[abs(d) >> 1]
+                R = self._jacobian_add_mixed(R, (x, y if d > 0 else p - y))
+            if i < len(p_digits) and p_digits[i]:
+                d = p_digits[i]
+                x, y = p_table[abs(d) >> 1]
+                R = self._jacobian_add_mixed(R, (x, y if d > 0 else p - y))
+        return R
 
     # --------- 哈希和KDF ---------
+    def _hash_new(self):
+        return _sm3_new()
+
     def _hash(self, data):
-        try:
-            h = hashlib.new('sm3')
-        except:
-            h = hashlib.sha256()
+        h = self._hash_new()
         h.update(data)
         return h.digest()
 
+    def _hash_many(self, messages):
+        if HASHLIB_SM3:
+            return [hashlib.new('sm3', m).digest() for m in messages]
+        return sm3_many(messages)
+
+    def _kdf_blocks(self, Z, ct, count):
+        # 第 ct .. ct+count-1 个 KDF 输出块；Z 部分的哈希状态只吸收一次再复制
+        if not HASHLIB_SM3:
+            # 各块输入等长，直接按通道并行计算
+            return b''.join(sm3_many([Z + i.to_bytes(4, 'big') for i in range(ct, ct + count)]))
+        base = self._hash_new()
+        base.update(Z)
+        blocks = []
+        for i in range(ct, ct + count):
+            h = base.copy()
+            h.update(i.to_bytes(4, 'big'))
+            blocks.append(h.digest())
+        return b''.join(blocks)
+
     def _kdf(self, Z, klen):
-        ct = 1
-        output = b''
-        while len(output) < klen:
-            output += self._hash(Z + ct.to_bytes(4, 'big'))
-            ct += 1
-        return output[:klen]
+        return self._kdf_blocks(Z, 1, (klen + 31) // 32)[:klen]
+
+    def _xor(self, data, keystream):
+        # 按字异或：NumPy 向量化，或整体转成大整数一次异或
+        n = len(data)
+        if np is not None:
+            return np.bitwise_xor(np.frombuffer(data, dtype=np.uint8, count=n),
+                                  np.frombuffer(keystream, dtype=np.uint8, count=n)).tobytes()
+        return (int.from_bytes(data, 'little') ^ int.from_bytes(keystream[:n], 'little')).to_bytes(n, 'little')
 
     # --------- SM2 密钥生成 ---------
     def generate_keypair(self):
@@ -167,49 +772,104 @@ class SM2:
         P = self._point_mul(d, self.G)
         return d, P
 
-    def serialize_public_key(self, P):
+    def generate_keypairs(self, count, chunk_size=256):
+        """批量生成 count 个密钥对，以迭代器逐个返回。
+
+        每 chunk_size 个公钥先在雅可比坐标下算出，再共用一次模逆归一化，
+        内存占用只与 chunk_size 有关。
+        """
+        remaining = count
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            ds = [random.randint(1, self.n - 1) for _ in range(size)]
+            points = self._batch_to_affine([self._point_mul_comb(d) for d in ds])
+            yield from zip(ds, points)
+            remaining -= size
+
+    def serialize_public_key(self, P, compressed=False):
+        if compressed:
+            return bytes([2 | (P[1] & 1)]) + P[0].to_bytes(32, 'big')
         return b'\x04' + P[0].to_bytes(32, 'big') + P[1].to_bytes(32, 'big')
 
+    def deserialize_public_key(self, data):
+        return _decode_point(bytes(data))
+
+    def _c1_length(self, prefix):
+        if prefix == 0x04:
+            return 65
+        if prefix in (0x02, 0x03):
+            return 33
+        raise ValueError("Invalid ciphertext format")
+
+    # --------- 密钥对象 ---------
+    def private_key(self, d, user_id=DEFAULT_USER_ID, public_point=None):
+        return SM2PrivateKey(self, d, user_id, public_point)
+
+    def public_key(self, point, user_id=DEFAULT_USER_ID):
+        return SM2PublicKey(self, point, user_id)
+
+    def _public_point(self, key):
+        return key.point if isinstance(key, SM2PublicKey) else key
+
+    def _private_scalar(self, key):
+        return key.d if isinstance(key, SM2PrivateKey) else key
+
+    def _signing_params(self, key):
+        # 返回 (d, (1 + d)^-1)；密钥对象直接取缓存值
+        if isinstance(key, SM2PrivateKey):
+            return key.d, key.inv_1_plus_d
+        return key, self._mod_inverse(1 + key, self.n)
+
+    def _message_digest(self, key, msg):
+        # 密钥对象按标准计算 e = SM3(Z_A || M)；裸整数/坐标保持 e = SM3(M)
+        if isinstance(msg, str):
+            msg = msg.encode()
+        if isinstance(key, (SM2PrivateKey, SM2PublicKey)):
+            return key.digest(msg)
+        return int.from_bytes(self._hash(msg), 'big')
+
     # --------- SM2 加密 ---------
-    def encrypt(self, public_key, msg):
+    def encrypt(self, public_key, msg, method=None, compressed=False):
         if isinstance(msg, str): 
             msg = msg.encode()
+        public_key = self._public_point(public_key)
         klen = len(msg)
         k = random.randint(1, self.n - 1)
 
         C1 = self._point_mul(k, self.G)
-        C1_bytes = self.serialize_public_key(C1)
+        C1_bytes = self.serialize_public_key(C1, compressed)
 
-        S = self._point_mul(k, public_key)
+        S = self._point_mul(k, public_key, method)
         x2_bytes = S[0].to_bytes(32, 'big')
         y2_bytes = S[1].to_bytes(32, 'big')
 
         t = self._kdf(x2_bytes + y2_bytes, klen)
-        if all(b == 0 for b in t):
+        if t.count(0) == len(t):
             raise ValueError("KDF = 0")
 
-        C2 = bytes([m ^ t_i for m, t_i in zip(msg, t)])
+        C2 = self._xor(msg, t)
         C3 = self._hash(x2_bytes + msg + y2_bytes)
 
         return C1_bytes + C3 + C2
 
     # --------- SM2 解密 ---------
-    def decrypt(self, private_key, ciphertext):
-        if ciphertext[0] != 0x04:
-            raise ValueError("Invalid ciphertext format")
-        C1 = (int.from_bytes(ciphertext[1:33], 'big'), int.from_bytes(ciphertext[33:65], 'big'))
-        C3 = ciphertext[65:97]
-        C2 = ciphertext[97:]
+    def decrypt(self, private_key, ciphertext, method=None):
+        private_key = self._private_scalar(private_key)
+        c1_len = self._c1_length(ciphertext[0])
+        C1 = self.deserialize_public_key(ciphertext[:c1_len])
+        C3 = ciphertext[c1_len:c1_len + 32]
+        C2 = ciphertext[c1_len + 32:]
 
-        S = self._point_mul(private_key, C1)
+        # 私钥标量默认走梯子法，不随 variable_base 切换到 wNAF
+        S = self._point_mul(private_key, C1, method or "ladder", cache=False)
         x2_bytes = S[0].to_bytes(32, 'big')
         y2_bytes = S[1].to_bytes(32, 'big')
 
         t = self._kdf(x2_bytes + y2_bytes, len(C2))
-        if all(b == 0 for b in t):
+        if t.count(0) == len(t):
             raise ValueError("KDF = 0")
 
-        M = bytes([c ^ t_i for c, t_i in zip(C2, t)])
+        M = self._xor(C2, t)
         u = self._hash(x2_bytes + M + y2_bytes)
 
         if u != C3:
@@ -217,38 +877,371 @@ class SM2:
 
         return M
 
+    # --------- SM2 流式加解密 ---------
+    def _xor_into(self, buf, n, keystream):
+        # 在复用的缓冲区上原地异或前 n 个字节
+        if np is not None:
+            view = np.frombuffer(buf, dtype=np.uint8, count=n)
+            np.bitwise_xor(view, np.frombuffer(keystream, dtype=np.uint8, count=n), out=view)
+        else:
+            buf[:n] = self._xor(memoryview(buf)[:n], keystream)
+
+    def encrypt_stream(self, public_key, src, dst, chunk_size=1 << 20, method=None, compressed=False):
+        """把 src 中的明文流式加密写入 dst，输出格式与 encrypt() 相同（C1 || C3 || C2）。
+
+        C3 依赖完整明文，先写占位再回填，因此 dst 必须可 seek。
+        内存占用只与 chunk_size 有关，返回写入的密文总长度。
+        """
+        if not dst.seekable():
+            raise ValueError("dst must be seekable to back-fill C3")
+        if chunk_size < 32:
+            raise ValueError("chunk_size must be at least 32")
+        public_key = self._public_point(public_key)
+        chunk_size -= chunk_size % 32
+        k = random.randint(1, self.n - 1)
+        C1 = self._point_mul(k, self.G)
+        S = self._point_mul(k, public_key, method)
+        x2_bytes = S[0].to_bytes(32, 'big')
+        y2_bytes = S[1].to_bytes(32, 'big')
+        Z = x2_bytes + y2_bytes
+
+        C1_bytes = self.serialize_public_key(C1, compressed)
+        dst.write(C1_bytes)
+        c3_pos = dst.tell()
+        dst.write(bytes(32))
+        h = self._hash_new()
+        h.update(x2_bytes)
+
+        buf = bytearray(chunk_size)
+        keystream = _KDFStream(self, Z)
+        total = 0
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            h.update(memoryview(buf)[:n])
+            self._xor_into(buf, n, keystream.take(n))
+            dst.write(memoryview(buf)[:n])
+            total += n
+        if not keystream.nonzero:
+            raise ValueError("KDF = 0")
+
+        h.update(y2_bytes)
+        end = dst.tell()
+        dst.seek(c3_pos)
+        dst.write(h.digest())
+        dst.seek(end)
+        return len(C1_bytes) + 32 + total
+
+    def decrypt_stream(self, private_key, src, dst, chunk_size=1 << 20, method=None):
+        """流式解密 encrypt_stream() / encrypt() 产生的密文，明文写入 dst。
+
+        C3 只能在读完全部 C2 后校验；校验失败时抛出 ValueError，
+        此时 dst 中已写出的内容必须丢弃。返回明文长度。
+        """
+        if chunk_size < 32:
+            raise ValueError("chunk_size must be at least 32")
+        private_key = self._private_scalar(private_key)
+        head = src.read(1)
+        if not head:
+            raise ValueError("Invalid ciphertext format")
+        c1_len = self._c1_length(head[0])
+        while len(head) < c1_len + 32:
+            more = src.read(c1_len + 32 - len(head))
+            if not more:
+                break
+            head += more
+        if len(head) != c1_len + 32:
+            raise ValueError("Invalid ciphertext format")
+        chunk_size -= chunk_size % 32
+        C1 = self.deserialize_public_key(head[:c1_len])
+        C3 = head[c1_len:]
+        S = self._point_mul(private_key, C1, method or "ladder", cache=False)
+        x2_bytes = S[0].to_bytes(32, 'big')
+        y2_bytes = S[1].to_bytes(32, 'big')
+        Z = x2_bytes + y2_bytes
+
+        h = self._hash_new()
+        h.update(x2_bytes)
+        buf = bytearray(chunk_size)
+        keystream = _KDFStream(self, Z)
+        total = 0
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            self._xor_into(buf, n, keystream.take(n))
+            h.update(memoryview(buf)[:n])
+            dst.write(memoryview(buf)[:n])
+            total += n
+        if not keystream.nonzero:
+            raise ValueError("KDF = 0")
+
+        h.update(y2_bytes)
+        if h.digest() != C3:
+            raise ValueError("Hash verification failed")
+        return total
+
     # --------- SM2 签名 ---------
+    def enable_nonce_pool(self, low_watermark=64, high_watermark=1024, batch_size=64):
+        """开启离线/在线签名：之后 sign() 从后台预计算的 nonce 池取 (k, x1)。"""
+        if self.nonce_pool is not None:
+            self.nonce_pool.close()
+        self.nonce_pool = NoncePool(self, low_watermark, high_watermark, batch_size)
+        return self.nonce_pool
+
+    def disable_nonce_pool(self):
+        if self.nonce_pool is not None:
+            self.nonce_pool.close()
+            self.nonce_pool = None
+
     def sign(self, private_key, msg):
-        if isinstance(msg, str):
-            msg = msg.encode()
-        e = int.from_bytes(self._hash(msg), 'big')
+        """private_key 可为整数 d 或 SM2PrivateKey（后者签名 SM3(Z_A || M)）。"""
+        d, d_inv = self._signing_params(private_key)
+        e = self._message_digest(private_key, msg)
         while True:
-            k = random.randint(1, self.n - 1)
-            x1, y1 = self._point_mul(k, self.G)
+            if self.nonce_pool is not None:
+                k, x1 = self.nonce_pool.take()
+            else:
+                k = random.randint(1, self.n - 1)
+                x1, y1 = self._point_mul(k, self.G)
             r = (e + x1) % self.n
             if r == 0 or r + k == self.n:
                 continue
-            s = (self._mod_inverse(1 + private_key, self.n) * (k - r * private_key)) % self.n
+            s = d_inv * (k - r * d) % self.n
             if s == 0:
                 continue
             return (r, s)
 
+    def sign_many(self, private_key, messages, chunk_size=256):
+        """用同一私钥对 messages 逐条签名，以迭代器按输入顺序返回 (r, s)。
+
+        与 generate_keypairs 相同，每个分块的 k*G 共用一次模逆；
+        (1 + d)^-1 也只计算一次。
+        """
+        d, d_inv = self._signing_params(private_key)
+        it = iter(messages)
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                return
+            chunk = [m.encode() if isinstance(m, str) else m for m in chunk]
+            ks = [random.randint(1, self.n - 1) for _ in chunk]
+            points = self._batch_to_affine([self._point_mul_comb(k) for k in ks])
+            if isinstance(private_key, SM2PrivateKey):
+                digests = [private_key.digest(m) for m in chunk]
+            else:
+                digests = [int.from_bytes(h, 'big') for h in self._hash_many(chunk)]
+            for msg, e, k, (x1, _) in zip(chunk, digests, ks, points):
+                r = (e + x1) % self.n
+                s = d_inv * (k - r * d) % self.n
+                if r == 0 or r + k == self.n or s == 0:
+                    # 极小概率事件，换一个 k 单独重签
+                    yield self.sign(private_key, msg)
+                else:
+                    yield (r, s)
+
     # --------- SM2 验签 ---------
     def verify(self, public_key, msg, signature):
-        if isinstance(msg, str):
-            msg = msg.encode()
+        """public_key 可为坐标 (x, y) 或 SM2PublicKey（后者验证 SM3(Z_A || M)）。"""
         r, s = signature
         if not (1 <= r < self.n and 1 <= s < self.n):
             return False
-        e = int.from_bytes(self._hash(msg), 'big')
+        e = self._message_digest(public_key, msg)
+        return self._verify_digest(self._public_point(public_key), e, (r, s))
+
+    # --------- SM2 批量验签（随机线性组合 + Pippenger 多标量乘） ---------
+    def sign_recoverable(self, private_key, msg):
+        """签名并附带恢复标识 v：bit0 为 y1 的奇偶性，bit1 表示 x1 >= n。
+
+        (r, s) 部分与 sign() 完全相同；v 让验签方无需计算 sG + tP 即可
+        还原出点 (x1, y1)，这是批量验签所需要的。
+        """
+        d, d_inv = self._signing_params(private_key)
+        e = self._message_digest(private_key, msg)
+        while True:
+            k = random.randint(1, self.n - 1)
+            x1, y1 = self._point_mul(k, self.G)
+            r = (e + x1) % self.n
+            if r == 0 or r + k == self.n:
+                continue
+            s = d_inv * (k - r * d) % self.n
+            if s == 0:
+                continue
+            v = (y1 & 1) | (2 if x1 >= self.n else 0)
+            return (r, s, v)
+
+    def _is_on_curve(self, P):
+        x, y = P
+        if not (0 <= x < self.p and 0 <= y < self.p):
+            return False
+        return (y * y - (x * x + self.a) * x - self.b) % self.p == 0
+
+    def _lift_x(self, x, y_parity):
+        if x >= self.p:
+            return None
+        rhs = ((x * x + self.a) * x + self.b) % self.p
+        y = pow(rhs, SQRT_EXP, self.p)
+        if (y * y) % self.p != rhs:
+            return None
+        if (y & 1) != y_parity:
+            y = self.p - y
+        return (x, y)
+
+    def _multi_scalar_mul(self, scalars, points):
+        """Pippenger 桶算法计算 sum(k_i * P_i)，返回雅可比坐标。
+
+        窗口宽度 c 随点数取 ≈ log2(m)，每个窗口把点按该窗口的数字放入
+        2^c - 1 个桶，再用前缀和一次性求出 sum(j * bucket_j)。
+        """
+        if not points:
+            return (0, 1, 0)
+        m = len(points)
+        c = max(2, m.bit_length() - 2) if m > 32 else (3 if m > 4 else 2)
+        max_bits = max(k.bit_length() for k in scalars)
+        windows = (max_bits + c - 1) // c
+        mask = (1 << c) - 1
+
+        R = (0, 1, 0)
+        for w in reversed(range(windows)):
+            for _ in range(c):
+                R = self._jacobian_double(R)
+            buckets = [(0, 1, 0)] * (mask + 1)
+            shift = w * c
+            for k, P in zip(scalars, points):
+                d = (k >> shift) & mask
+                if d:
+                    buckets[d] = self._jacobian_add_mixed(buckets[d], P)
+            running = (0, 1, 0)
+            acc = (0, 1, 0)
+            for d in range(mask, 0, -1):
+                running = self._jacobian_add(running, buckets[d])
+                acc = self._jacobian_add(acc, running)
+            R = self._jacobian_add(R, acc)
+        return R
+
+    def _batch_check(self, entries):
+        # entries: [(public_key, e, r, s, t, R)]，检查 sum a_i (s_i G + t_i P_i - R_i) = O
+        rng = random.SystemRandom()
+        g_scalar = 0
+        key_scalars = {}
+        scalars = []
+        points = []
+        for idx, (P, e, r, s, t, R) in enumerate(entries):
+            a = 1 if idx == 0 else rng.getrandbits(128) | 1
+            g_scalar = (g_scalar + a * s) % self.n
+            key_scalars[P] = (key_scalars.get(P, 0) + a * t) % self.n
+            # -a * R 用取负点表示，保持标量为 128 位短标量
+            scalars.append(a)
+            points.append((R[0], self.p - R[1]))
+        for P, k in key_scalars.items():
+            if k:
+                scalars.append(k)
+                points.append(P)
+        if g_scalar:
+            scalars.append(g_scalar)
+            points.append(self.G)
+        return self._multi_scalar_mul(scalars, points)[2] == 0
+
+    def verify_batch(self, items):
+        """批量验签，items 为 [(public_key, msg, signature)]，返回与输入同序的布尔列表。
+
+        签名可为 sign() 的 (r, s) 或 sign_recoverable() 的 (r, s, v)，可以混合。
+        带 v 的签名能还原 R = (x1, y1)，做随机线性组合 + Pippenger 一次校验，
+        失败时二分定位坏签名；标准 (r, s) 签名见 _verify_plain_batch()。
+        """
+        results = [False] * len(items)
+        pending = []
+        plain = []
+        for i, (public_key, msg, signature) in enumerate(items):
+            if len(signature) != 3:
+                r, s = signature
+                if not (1 <= r < self.n and 1 <= s < self.n):
+                    continue
+                t = (r + s) % self.n
+                point = self._public_point(public_key)
+                if t == 0 or not self._is_on_curve(point):
+                    continue
+                plain.append((i, point, self._message_digest(public_key, msg), r, s, t))
+                continue
+            r, s, v = signature
+            if not (1 <= r < self.n and 1 <= s < self.n):
+                continue
+            t = (r + s) % self.n
+            point = self._public_point(public_key)
+            if t == 0 or not self._is_on_curve(point):
+                continue
+            e = self._message_digest(public_key, msg)
+            x1 = (r - e) % self.n + (self.n if v & 2 else 0)
+            R = self._lift_x(x1, v & 1)
+            if R is None:
+                continue
+            pending.append((i, (point, e, r, s, t, R)))
+
+        def bisect(group):
+            if not group:
+                return
+            if len(group) == 1:
+                i, entry = group[0]
+                P, e, r, s, _, _ = entry
+                results[i] = self._verify_digest(P, e, (r, s))
+                return
+            if self._batch_check([entry for _, entry in group]):
+                for i, _ in group:
+                    results[i] = True
+                return
+            half = len(group) // 2
+            bisect(group[:half])
+            bisect(group[half:])
+
+        bisect(pending)
+        for i, ok in self._verify_plain_batch(plain):
+            results[i] = ok
+        return results
+
+    def _verify_plain_batch(self, entries):
+        """entries: [(i, P, e, r, s, t)]，逐条产出 (i, 是否有效)。
+
+        y1 的符号未知，(r, s) 签名不能做随机线性组合，改为共享各条之间的工作：
+        sG 走 G 的梳状表；同一公钥有多条签名时为该公钥临时建一张单表梳状表
+        （约 256 次倍点 + 2^w 次点加），此后每个 tP 只需约 2·256/w 次点运算；
+        x 坐标在雅可比坐标下比较，不做模逆。
+        """
+        groups = {}
+        for entry in entries:
+            groups.setdefault(entry[1], []).append(entry)
+        for P, group in groups.items():
+            if len(group) == 1:
+                i, _, e, r, s, t = group[0]
+                yield i, self._x_matches(self._joint_mul(s, t, P), r, e)
+                continue
+            # 建表 2^w 次点加与每条 2·256/w 次点运算之间取平衡
+            w = min(range(4, 9), key=lambda w: (1 << w) + 512 * len(group) // w)
+            comb = self._build_comb(P, w, 1)
+            for i, _, e, r, s, t in group:
+                R = self._jacobian_add(self._point_mul_comb(s), self._point_mul_comb(t, comb, w, 1))
+                yield i, self._x_matches(R, r, e)
+
+    def _verify_digest(self, public_key, e, signature):
+        r, s = signature
         t = (r + s) % self.n
         if t == 0:
             return False
-        x1, y1 = self._point_mul(s, self.G)
-        x2, y2 = self._point_mul(t, public_key)
-        x, y = self._jacobian_to_affine(self._jacobian_add((x1, y1, 1), (x2, y2, 1)))
-        R = (e + x) % self.n
-        return R == r
+        return self._x_matches(self._joint_mul(s, t, public_key), r, e)
+
+    def _x_matches(self, R, r, e):
+        X, Y, Z = R
+        if Z == 0:
+            return False
+        # (e + x) mod n == r  <=>  x ∈ {r - e mod n, r - e mod n + n}，
+        # 直接与 X / Z^2 比较，省去最后一次模逆
+        ZZ = (Z * Z) % self.p
+        x = (r - e) % self.n
+        while x < self.p:
+            if (x * ZZ - X) % self.p == 0:
+                return True
+            x += self.n
+        return False
 
 if __name__ == "__main__":
     sm2 = SM2()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import chain, islice
+
+from SM2_optimized import SM2
+
+# 进程池的每个 worker 进程持有一个 SM2 实例，预计算表在初始化时构建一次；
+# 线程池共享模块全局变量，实例改为挂在 SM2Pool 上，由 _run 传给分块函数
+_worker_sm2 = None
+
+
+def _make_sm2(sm2_kwargs):
+    sm2 = SM2(**sm2_kwargs)
+    sm2.comb_table
+    sm2.precompute_table
+    return sm2
+
+
+def _init_worker(sm2_kwargs):
+    global _worker_sm2
+    _worker_sm2 = _make_sm2(sm2_kwargs)
+
+
+def _in_worker(func, *args):
+    return func(_worker_sm2, *args)
+
+
+def _sign_chunk(sm2, private_key, messages):
+    return list(sm2.sign_many(private_key, messages))
+
+
+def _verify_chunk(sm2, items):
+    return sm2.verify_batch(items)
+
+
+def _encrypt_chunk(sm2, public_key, messages):
+    return [sm2.encrypt(public_key, m) for m in messages]
+
+
+def _decrypt_chunk(sm2, private_key, ciphertexts):
+    return [sm2.decrypt(private_key, c) for c in ciphertexts]
+
+
+def _gil_disabled():
+    # free-threaded 构建（PEP 703）下线程即可真正并行
+    check = getattr(sys, "_is_gil_enabled", None)
+    return check is not None and not check()
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class SM2Pool:
+    """把 sign / verify / encrypt / decrypt 分块派发到多个 worker 并行执行。
+
+    backend 为 "process"、"thread" 或 "auto"（默认）：auto 在 free-threaded
+    Python 上使用线程池，否则使用进程池。结果与输入顺序一致。
+    """
+
+    def __init__(self, workers=None, backend="auto", chunk_size=64, **sm2_kwargs):
+        if backend == "auto":
+            backend = "thread" if _gil_disabled() else "process"
+        if backend not in ("process", "thread"):
+            raise ValueError(f"unknown backend: {backend}")
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        if backend == "process":
+            self._sm2 = None
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(sm2_kwargs,))
+        else:
+            self._sm2 = _make_sm2(sm2_kwargs)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def _run(self, func, chunks, *args):
+        if self._sm2 is None:
+            call = partial(_in_worker, func, *args)
+        else:
+            call = partial(func, self._sm2, *args)
+        results = self._executor.map(call, chunks)
+        return list(chain.from_iterable(results))
+
+    def sign(self, private_key, messages):
+        return self._run(_sign_chunk, _chunks(messages, self.chunk_size), private_key)
+
+    def verify(self, items):
+        """items 为 [(public_key, msg, signature)]，返回布尔列表。"""
+        return self._run(_verify_chunk, _chunks(items, self.chunk_size))
+
+    def encrypt(self, public_key, messages):
+        return self._run(_encrypt_chunk, _chunks(messages, self.chunk_size), public_key)
+
+    def decrypt(self, private_key, ciphertexts):
+        return self._run(_decrypt_chunk, _chunks(ciphertexts, self.chunk_size), private_key)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    sm2 = SM2()
+    priv, pub = sm2.generate_keypair()
+    messages = [f"record-{i}".encode() for i in range(2000)]
+
+    t1 = time.time()
+    signatures = list(sm2.sign_many(priv, messages))
+    valid = all(sm2.verify(pub, m, sig) for m, sig in zip(messages, signatures))
+    t2 = time.time()
+    print(f"单进程 签名+验签 {len(messages)} 条: {(t2 - t1) * 1000:.2f} ms, 结果: {valid}")
+
+    with SM2Pool() as pool:
+        t3 = time.time()
+        signatures = pool.sign(priv, messages)
+        valid = all(pool.verify([(pub, m, sig) for m, sig in zip(messages, signatures)]))
+        t4 = time.time()
+    print(f"SM2Pool({pool.workers} workers) 签名+验签 {len(messages)} 条: {(t4 - t3) * 1000:.2f} ms, 结果: {valid}")
@@ -0,0 +1,191 @@
+import struct
+import time
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时 sm3_many 逐条走标量实现
+    np = None
+
+# SM3 参数（GM/T 0004-2012），压缩函数与 project-04/SM3_optimized.cpp 一致
+IV = (0x7380166F, 0x4914B2B9, 0x172442D7, 0xDA8A0600,
+      0xA96F30BC, 0x163138AA, 0xE38DEE4D, 0xB0FB0E4E)
+MASK = 0xFFFFFFFF
+
+
+def _rotl(x, n):
+    n %= 32
+    return ((x << n) | (x >> (32 - n))) & MASK
+
+
+# T_j <<< (j mod 32) 提前算好
+T_ROT = tuple(_rotl(0x79CC4519 if j < 16 else 0x7A879D8A, j) for j in range(64))
+
+
+def _pad(length):
+    # 填充 1 个 '1' 比特与若干 0，使长度 ≡ 448 (mod 512)，再附加 64 位消息比特长度
+    zeros = (55 - length) % 64
+    return b'\x80' + b'\x00' * zeros + struct.pack('>Q', length * 8)
+
+
+# --------- 标量实现 ---------
+def _compress(V, block):
+    W = list(struct.unpack('>16I', block))
+    for j in range(16, 68):
+        x = W[j - 16] ^ W[j - 9] ^ _rotl(W[j - 3], 15)
+        W.append((x ^ _rotl(x, 15) ^ _rotl(x, 23)) ^ _rotl(W[j - 13], 7) ^ W[j - 6])
+
+    A, B, C, D, E, F, G, H = V
+    for j in range(64):
+        A12 = _rotl(A, 12)
+        SS1 = _rotl((A12 + E + T_ROT[j]) & MASK, 7)
+        SS2 = SS1 ^ A12
+        if j < 16:
+            FF = A ^ B ^ C
+            GG = E ^ F ^ G
+        else:
+            FF = (A & B) | (A & C) | (B & C)
+            GG = (E & F) | (~E & G)
+        TT1 = (FF + D + SS2 + (W[j] ^ W[j + 4])) & MASK
+        TT2 = (GG + H + SS1 + W[j]) & MASK
+        D = C
+        C = _rotl(B, 9)
+        B = A
+        A = TT1
+        H = G
+        G = _rotl(F, 19)
+        F = E
+        E = TT2 ^ _rotl(TT2, 9) ^ _rotl(TT2, 17)
+    return tuple(v ^ w for v, w in zip(V, (A, B, C, D, E, F, G, H)))
+
+
+class SM3:
+    """与 hashlib 对象接口一致的纯 Python SM3（update / digest / hexdigest / copy）。"""
+
+    name = 'sm3'
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data=b''):
+        self._V = IV
+        self._buf = b''
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        data = self._buf + bytes(data)
+        self._length += len(data) - len(self._buf)
+        V = self._V
+        end = len(data) - len(data) % 64
+        for i in range(0, end, 64):
+            V = _compress(V, data[i:i + 64])
+        self._V = V
+        self._buf = data[end:]
+
+    def copy(self):
+        other = SM3.__new__(SM3)
+        other._V = self._V
+        other._buf = self._buf
+        other._length = self._length
+        return other
+
+    def digest(self):
+        tail = self._buf + _pad(self._length)
+        V = self._V
+        for i in range(0, len(tail), 64):
+            V = _compress(V, tail[i:i + 64])
+        return struct.pack('>8I', *V)
+
+    def hexdigest(self):
+        return self.digest().hex()
+
+
+def sm3(data):
+    return SM3(data).digest()
+
+
+# --------- NumPy 多消息并行实现 ---------
+def _rotl_np(x, n):
+    n %= 32
+    if n == 0:
+        return x
+    return (x << np.uint32(n)) | (x >> np.uint32(32 - n))
+
+
+def _compress_lanes(V, W16):
+    # V: (8, N) uint32；W16: (16, N) uint32，每一列是一条消息的当前分组
+    W = [W16[j] for j in range(16)]
+    for j in range(16, 68):
+        x = W[j - 16] ^ W[j - 9] ^ _rotl_np(W[j - 3], 15)
+        W.append((x ^ _rotl_np(x, 15) ^ _rotl_np(x, 23)) ^ _rotl_np(W[j - 13], 7) ^ W[j - 6])
+
+    A, B, C, D, E, F, G, H = V
+    for j in range(64):
+        A12 = _rotl_np(A, 12)
+        SS1 = _rotl_np(A12 + E + np.uint32(T_ROT[j]), 7)
+        SS2 = SS1 ^ A12
+        if j < 16:
+            FF = A ^ B ^ C
+            GG = E ^ F ^ G
+        else:
+            FF = (A & B) | (A & C) | (B & C)
+            GG = (E & F) | (~E & G)
+        TT1 = FF + D + SS2 + (W[j] ^ W[j + 4])
+        TT2 = GG + H + SS1 + W[j]
+        D = C
+        C = _rotl_np(B, 9)
+        B = A
+        A = TT1
+        H = G
+        G = _rotl_np(F, 19)
+        F = E
+        E = TT2 ^ _rotl_np(TT2, 9) ^ _rotl_np(TT2, 17)
+    return V ^ np.stack([A, B, C, D, E, F, G, H])
+
+
+def _sm3_equal_length(messages):
+    # 等长消息填充后分组数相同，可按 uint32 通道整体推进
+    tail = _pad(len(messages[0]))
+    blocks = np.frombuffer(b''.join(m + tail for m in messages), dtype='>u4')
+    blocks = blocks.astype(np.uint32).reshape(len(messages), -1, 16)
+    V = np.tile(np.array(IV, dtype=np.uint32)[:, None], (1, len(messages)))
+    for b in range(blocks.shape[1]):
+        V = _compress_lanes(V, blocks[:, b, :].T)
+    digests = V.T.astype('>u4').tobytes()
+    return [digests[i * 32:(i + 1) * 32] for i in range(len(messages))]
+
+
+def sm3_many(messages, min_lanes=8):
+    """并行计算多条消息的 SM3 摘要，返回与输入同序的 32 字节摘要列表。
+
+    消息按长度分组，每组作为 N 条 uint32 通道在 NumPy 数组中同时压缩；
+    少于 min_lanes 条的组（或没有 NumPy 时）走标量实现。
+    """
+    messages = [bytes(m) for m in messages]
+    result = [None] * len(messages)
+    groups = {}
+    for i, m in enumerate(messages):
+        groups.setdefault(len(m), []).append(i)
+    for idxs in groups.values():
+        if np is None or len(idxs) < min_lanes:
+            for i in idxs:
+                result[i] = sm3(messages[i])
+        else:
+            for i, d in zip(idxs, _sm3_equal_length([messages[i] for i in idxs])):
+                result[i] = d
+    return result
+
+
+if __name__ == "__main__":
+    print("SM3(abc) =", sm3(b"abc").hex())
+
+    msgs = [i.to_bytes(4, 'big') * 16 for i in range(4096)]
+    t1 = time.time()
+    scalar = [sm3(m) for m in msgs]
+    t2 = time.time()
+    print(f"标量 SM3 {len(msgs)} 条: {(t2 - t1) * 1000:.2f} ms")
+
+    t3 = time.time()
+    lanes = sm3_many(msgs)
+    t4 = time.time()
+    print(f"NumPy 并行 SM3 {len(msgs)} 条: {(t4 - t3) * 1000:.2f} ms, 结果一致: {lanes == scalar}")
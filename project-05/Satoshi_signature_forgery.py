@@ -1,5 +1,12 @@
 import random
 import hashlib
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count as _count, islice
+
+from op_counter import op_cost
 
 # 定义椭圆曲线参数 (secp256k1 - 比特币使用的曲线)
 P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
@@ -9,13 +16,54 @@ N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
 Gx = 0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798
 Gy = 0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
 
+# secp256k1 的 GLV 自同态 φ(x, y) = (β·x, y) = λ·(x, y)，以及标量分解用的格基
+GLV_BETA = 0x7AE96A2B657C07106E64479EAC3434E99CF0497512F58995C1396C28719501EE
+GLV_LAMBDA = 0x5363AD4CC05C30E0A5261C028812645A122E22EA20816678DF02967C1B23BD72
+GLV_A1 = 0x3086D221A7D46BCDE86C90E49284EB15
+GLV_B1 = -0xE4437ED6010E88286F547FA90ABFE4C3
+GLV_A2 = 0x114CA50F7A8E2F3F657C1108D9D44CFD8
+GLV_B2 = GLV_A1
+
+def batch_mod_inverse(values, modulus):
+    """Montgomery 同时求逆：一次模逆得到全部 values 的逆元（values 中不能有 0）"""
+    prefix = []
+    acc = 1
+    for v in values:
+        prefix.append(acc)
+        acc = acc * v % modulus
+    inv = pow(acc, -1, modulus)
+    result = [0] * len(values)
+    for i in reversed(range(len(values))):
+        result[i] = inv * prefix[i] % modulus
+        inv = inv * values[i] % modulus
+    return result
+
+
+def _affine_add_cost(P, Q):
+    """与 EllipticCurve.add 的分支一致，add 内部的 pow(x, -1, p) 计为一次求逆"""
+    if P is None or Q is None or (P[0] == Q[0] and P[1] != Q[1]):
+        return {}
+    if P == Q:
+        return {"dbl": 1, "inv": 1, "mul": 2, "sqr": 2}
+    return {"add": 1, "inv": 1, "mul": 2, "sqr": 1}
+
+
 class EllipticCurve:
+    OP_ENTRY_POINTS = ("mul", "mul_add", "mul_add_many")
+
+    # 基点 G 与 φ(G) 的 wNAF 表宽度（2^(w-2) 个奇数倍点）
+    G_WINDOW = 8
+    WINDOW = 5
+
     def __init__(self, p, a, b, n, gx, gy):
         self.p = p
         self.a = a
         self.b = b
         self.n = n
         self.G = (gx, gy)
+        # 只有 secp256k1 才能使用 GLV 分解
+        self.glv = (p, a, b, n) == (P, A, B, N)
+        self._g_tables = None
     
     def is_on_curve(self, point):
         """检查点是否在椭圆曲线上"""
@@ -24,6 +72,20 @@ class EllipticCurve:
         x, y = point
         return (y * y - x * x * x - self.a * x - self.b) % self.p == 0
     
+    def lift_x(self, x, parity):
+        """由 x 坐标与 y 的奇偶性恢复曲线上的点（要求 p ≡ 3 mod 4），x 不合法时返回 None"""
+        p = self.p
+        if not 0 <= x < p:
+            return None
+        y2 = (x * x * x + self.a * x + self.b) % p
+        y = pow(y2, (p + 1) // 4, p)
+        if y * y % p != y2:
+            return None
+        if y & 1 != parity:
+            y = p - y
+        return (x, y)
+
+    @op_cost(_affine_add_cost)
     def add(self, P, Q):
         """椭圆曲线点加法"""
         if P is None:
@@ -46,17 +108,232 @@ class EllipticCurve:
         return (x3, y3)
     
     def mul(self, k, P):
-        """椭圆曲线标量乘法 (double-and-add算法)"""
-        result = None
-        current = P
-        
+        """椭圆曲线标量乘法 (雅可比坐标 + GLV 分解 + 交错 wNAF)"""
+        if P is None:
+            return None
+        return self._jacobian_to_affine(self._multi_mul([(k, P)]))
+
+    def mul_add(self, u1, u2, Q):
+        """联合计算 u1*G + u2*Q，只做一条倍点链和一次模逆"""
+        if Q is None:
+            return self.mul(u1, self.G)
+        return self._jacobian_to_affine(self._multi_mul([(u1, self.G), (u2, Q)]))
+
+    def mul_add_many(self, items):
+        """批量计算 [u1*G + u2*Q]，无穷远点对应 None"""
+        return self._to_affine_many(self._mul_add_many(items))
+
+    def _mul_add_many(self, items):
+        """items 为 [(u1, u2, Q)]，返回雅可比坐标结果。
+
+        G 的表在曲线对象上缓存；各个 Q 的奇数倍点表共用一次模逆归一化。
+        """
+        points = list(dict.fromkeys(Q for _, _, Q in items if Q is not None))
+        tables = dict(zip(points, self._odd_multiples_many(points, self.WINDOW)))
+        result = []
+        for u1, u2, Q in items:
+            pairs = [(u1, self.G)] if Q is None else [(u1, self.G), (u2, Q)]
+            result.append(self._multi_mul(pairs, tables))
+        return result
+
+    def _to_affine_many(self, points):
+        """批量转仿射坐标，只对有限点做一次共享模逆"""
+        finite = [i for i, R in enumerate(points) if R[2]]
+        result = [None] * len(points)
+        for i, R in zip(finite, self._batch_to_affine([points[i] for i in finite])):
+            result[i] = R
+        return result
+
+    # ---------- 雅可比坐标运算 ----------
+    @op_cost(lambda P: {"dbl": 1, "mul": 2, "sqr": 5} if P[2] and P[1] else {})
+    def _jacobian_double(self, P):
+        """倍点；a = 0 时 M = 3X^2"""
+        X1, Y1, Z1 = P
+        if Z1 == 0 or Y1 == 0:
+            return (0, 1, 0)
+        p = self.p
+        XX = X1 * X1 % p
+        YY = Y1 * Y1 % p
+        YYYY = YY * YY % p
+        S = 2 * ((X1 + YY) ** 2 - XX - YYYY) % p
+        M = 3 * XX
+        if self.a:
+            ZZ = Z1 * Z1 % p
+            M += self.a * ZZ * ZZ
+        M %= p
+        X3 = (M * M - 2 * S) % p
+        Y3 = (M * (S - X3) - 8 * YYYY) % p
+        Z3 = 2 * Y1 * Z1 % p
+        return (X3, Y3, Z3)
+
+    @op_cost(lambda P, Q: {"add": 1, "mul": 12, "sqr": 4} if P[2] and Q[2] else {})
+    def _jacobian_add(self, P, Q):
+        """雅可比 + 雅可比点加"""
+        if P[2] == 0:
+            return Q
+        if Q[2] == 0:
+            return P
+        p = self.p
+        X1, Y1, Z1 = P
+        X2, Y2, Z2 = Q
+        Z1Z1 = Z1 * Z1 % p
+        Z2Z2 = Z2 * Z2 % p
+        U1 = X1 * Z2Z2 % p
+        S1 = Y1 * Z2 % p * Z2Z2 % p
+        H = (X2 * Z1Z1 - U1) % p
+        R = (Y2 * Z1 % p * Z1Z1 - S1) % p
+        if H == 0:
+            return self._jacobian_double(P) if R == 0 else (0, 1, 0)
+        HH = H * H % p
+        HHH = H * HH % p
+        V = U1 * HH % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - S1 * HHH) % p
+        Z3 = H * Z1 % p * Z2 % p
+        return (X3, Y3, Z3)
+
+    @op_cost(lambda P, Q: {"add": 1, "mul": 8, "sqr": 3} if P[2] else {})
+    def _jacobian_add_affine(self, P, Q):
+        """雅可比 + 仿射混合点加"""
+        X1, Y1, Z1 = P
+        if Z1 == 0:
+            return (Q[0], Q[1], 1)
+        p = self.p
+        x2, y2 = Q
+        Z1Z1 = Z1 * Z1 % p
+        H = (x2 * Z1Z1 - X1) % p
+        R = (y2 * Z1 % p * Z1Z1 - Y1) % p
+        if H == 0:
+            return self._jacobian_double(P) if R == 0 else (0, 1, 0)
+        HH = H * H % p
+        HHH = H * HH % p
+        V = X1 * HH % p
+        X3 = (R * R - HHH - 2 * V) % p
+        Y3 = (R * (V - X3) - Y1 * HHH) % p
+        Z3 = Z1 * H % p
+        return (X3, Y3, Z3)
+
+    @op_cost(lambda P: {"inv": 1, "mul": 3, "sqr": 1} if P[2] else {})
+    def _jacobian_to_affine(self, P):
+        """雅可比坐标转仿射坐标，无穷远点返回 None"""
+        X, Y, Z = P
+        if Z == 0:
+            return None
+        p = self.p
+        z_inv = pow(Z, -1, p)
+        zz = z_inv * z_inv % p
+        return (X * zz % p, Y * zz % p * z_inv % p)
+
+    @op_cost(lambda points: {"inv": 1, "mul": max(6 * len(points) - 2, 0), "sqr": len(points)})
+    def _batch_to_affine(self, points):
+        """Montgomery 同时求逆：一次模逆把多个有限雅可比点转为仿射坐标"""
+        p = self.p
+        prefix = []
+        acc = 1
+        for _, _, Z in points:
+            prefix.append(acc)
+            acc = acc * Z % p
+        inv = pow(acc, -1, p)
+        result = [None] * len(points)
+        for i in reversed(range(len(points))):
+            X, Y, Z = points[i]
+            z_inv = inv * prefix[i] % p
+            inv = inv * Z % p
+            zz = z_inv * z_inv % p
+            result[i] = (X * zz % p, Y * zz % p * z_inv % p)
+        return result
+
+    # ---------- GLV 分解与多标量 wNAF ----------
+    def _glv_split(self, k):
+        """k ≡ k1 + k2·λ (mod n)，|k1|, |k2| 约 128 位"""
+        n = self.n
+        c1 = (GLV_B2 * k + n // 2) // n
+        c2 = (-GLV_B1 * k + n // 2) // n
+        k1 = k - c1 * GLV_A1 - c2 * GLV_A2
+        k2 = -c1 * GLV_B1 - c2 * GLV_B2
+        return k1, k2
+
+    def _wnaf(self, k, w):
+        """宽度 w 的有符号 NAF（低位在前）"""
+        digits = []
+        full = 1 << w
+        half = full >> 1
         while k:
             if k & 1:
-                result = self.add(result, current)
-            current = self.add(current, current)
+                d = k & (full - 1)
+                if d >= half:
+                    d -= full
+                k -= d
+            else:
+                d = 0
+            digits.append(d)
             k >>= 1
-        return result
+        return digits
+
+    def _odd_multiples(self, P, w):
+        """[P, 3P, ..., (2^(w-1)-1)P]，批量归一化为仿射点"""
+        return self._odd_multiples_many([P], w)[0]
+
+    def _odd_multiples_many(self, points, w):
+        """多个点的奇数倍点表，全部表项共用一次模逆归一化"""
+        size = (1 << (w - 2)) - 1
+        jacobian = []
+        for x, y in points:
+            P2 = self._jacobian_double((x, y, 1))
+            R = (x, y, 1)
+            for _ in range(size):
+                R = self._jacobian_add(R, P2)
+                jacobian.append(R)
+        flat = self._batch_to_affine(jacobian) if jacobian else []
+        return [[P] + flat[i * size:(i + 1) * size] for i, P in enumerate(points)]
+
+    def _endo_table(self, table):
+        """φ 作用于整张表：x 乘 β 即可，无需任何点运算"""
+        beta, p = GLV_BETA, self.p
+        return [(beta * x % p, y) for x, y in table]
+
+    def _tables_for(self, P, cache=None):
+        """返回 [(table, w)]，GLV 曲线上依次对应 P 与 φ(P)；cache 为已算好的 {P: 奇数倍点表}"""
+        if P == self.G:
+            if self._g_tables is None:
+                g = self._odd_multiples(self.G, self.G_WINDOW)
+                self._g_tables = [(g, self.G_WINDOW)]
+                if self.glv:
+                    self._g_tables.append((self._endo_table(g), self.G_WINDOW))
+            return self._g_tables
+        t = cache[P] if cache and P in cache else self._odd_multiples(P, self.WINDOW)
+        if self.glv:
+            return [(t, self.WINDOW), (self._endo_table(t), self.WINDOW)]
+        return [(t, self.WINDOW)]
+
+    def _multi_mul(self, pairs, cache=None):
+        """交错 wNAF（Straus）计算 sum(k_i * P_i)，返回雅可比坐标"""
+        terms = []
+        for k, P in pairs:
+            k %= self.n
+            if k == 0:
+                continue
+            tables = self._tables_for(P, cache)
+            parts = self._glv_split(k) if self.glv else (k,)
+            for part, (table, w) in zip(parts, tables):
+                if part == 0:
+                    continue
+                sign = 1 if part > 0 else -1
+                digits = [sign * d for d in self._wnaf(abs(part), w)]
+                terms.append((digits, table))
+
+        p = self.p
+        R = (0, 1, 0)
+        for i in reversed(range(max((len(d) for d, _ in terms), default=0))):
+            R = self._jacobian_double(R)
+            for digits, table in terms:
+                if i < len(digits) and digits[i]:
+                    d = digits[i]
+                    x, y = table[abs(d) >> 1]
+                    R = self._jacobian_add_affine(R, (x, y if d > 0 else p - y))
+        return R
     
+    @op_cost({"inv": 1})
     def mul_inv(self, a, modulus):
         """模逆计算 (扩展欧几里得算法)"""
         if a == 0:
@@ -71,6 +348,10 @@ class EllipticCurve:
 
 
 class ECDSA:
+    # 计数时与曲线对象一起传入：count_ops(ecdsa, ecdsa.curve)
+    OP_ENTRY_POINTS = ("generate_keypair", "sign", "sign_recoverable", "verify", "ver_no_m", "pretend",
+                       "recover_public_key", "recover_batch", "verify_batch", "pretend_many")
+
     def __init__(self, curve):
         self.curve = curve
     
@@ -80,6 +361,21 @@ class ECDSA:
         Q = self.curve.mul(d, self.curve.G)
         return d, Q
     
+    def sign_recoverable(self, d, message):
+        """带恢复标识的签名 (r, s, recid)：recid 低位为 R.y 的奇偶，第二位表示 R.x ≥ n"""
+        n = self.curve.n
+        while True:
+            k = random.randint(1, n - 1)
+            R = self.curve.mul(k, self.curve.G)
+            r = R[0] % n
+            if r == 0:
+                continue
+            e = self.hash_message(message)
+            s = (self.curve.mul_inv(k, n) * (e + d * r)) % n
+            if s == 0:
+                continue
+            return r, s, (R[1] & 1) | (2 if R[0] >= n else 0)
+
     def sign(self, d, message):
         """ECDSA签名"""
         k = random.randint(1, self.curve.n - 1)
@@ -108,16 +404,94 @@ class ECDSA:
         u1 = (e * w) % self.curve.n
         u2 = (r * w) % self.curve.n
         
-        # 计算点 u1*G + u2*Q
-        P1 = self.curve.mul(u1, self.curve.G)
-        P2 = self.curve.mul(u2, Q)
-        R_prime = self.curve.add(P1, P2)
+        # 计算点 u1*G + u2*Q（联合多标量乘）
+        R_prime = self.curve.mul_add(u1, u2, Q)
         
         if R_prime is None:
             return False
         
         return r == R_prime[0] % self.curve.n
     
+    def _recovery_point(self, signature, recid):
+        """由 (r, recid) 恢复签名时的 R 点，不合法时返回 None"""
+        r, s = signature
+        n = self.curve.n
+        if not (1 <= r < n and 1 <= s < n and 0 <= recid <= 3):
+            return None
+        return self.curve.lift_x(r + (recid >> 1) * n, recid & 1)
+
+    def recover_public_key(self, e, signature, recid):
+        """由摘要 e、签名与 recid 恢复公钥 Q = r^(-1)·(s·R - e·G)，失败返回 None"""
+        R = self._recovery_point(signature, recid)
+        if R is None:
+            return None
+        r, s = signature
+        n = self.curve.n
+        r_inv = self.curve.mul_inv(r, n)
+        return self.curve.mul_add(-e * r_inv % n, s * r_inv % n, R)
+
+    def recover_batch(self, items):
+        """批量恢复公钥，items 为 [(e, (r, s), recid)]，返回与输入同序的公钥（失败为 None）。
+
+        r^(-1) 与结果的仿射转换各只做一次共享模逆，G 的预计算表跨调用复用。
+        """
+        n = self.curve.n
+        points = [self._recovery_point(sig, recid) for _, sig, recid in items]
+        valid = [i for i, R in enumerate(points) if R is not None]
+        r_invs = batch_mod_inverse([items[i][1][0] for i in valid], n)
+        jobs = []
+        for i, r_inv in zip(valid, r_invs):
+            e, (r, s), _ = items[i]
+            jobs.append((-e * r_inv % n, s * r_inv % n, points[i]))
+        result = [None] * len(items)
+        for i, Q in zip(valid, self.curve.mul_add_many(jobs)):
+            result[i] = Q
+        return result
+
+    def verify_batch(self, items):
+        """批量验证，items 为 [(Q, e, (r, s))]，返回布尔列表。
+
+        s^(-1) 共用一次模逆；结果点不转仿射，直接比较 X ≡ x·Z^2 (mod p)，
+        x 取 r 与 r + n 两种可能。
+        """
+        n, p = self.curve.n, self.curve.p
+        result = [False] * len(items)
+        valid = [i for i, (Q, _, (r, s)) in enumerate(items)
+                 if Q is not None and 1 <= r < n and 1 <= s < n]
+        ws = batch_mod_inverse([items[i][2][1] for i in valid], n)
+        jobs = []
+        for i, w in zip(valid, ws):
+            Q, e, (r, _) = items[i]
+            jobs.append((e * w % n, r * w % n, Q))
+        for i, (X, _, Z) in zip(valid, self.curve._mul_add_many(jobs)):
+            if Z == 0:
+                continue
+            r = items[i][2][0]
+            ZZ = Z * Z % p
+            result[i] = X == r * ZZ % p or (r + n < p and X == (r + n) * ZZ % p)
+        return result
+
+    def serialize_public_key(self, Q, compressed=True):
+        """SEC1 编码：压缩 02/03 || x，非压缩 04 || x || y"""
+        x, y = Q
+        if compressed:
+            return bytes([2 | (y & 1)]) + x.to_bytes(32, 'big')
+        return b'\x04' + x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+
+    def deserialize_public_key(self, data):
+        """SEC1 解码，点不在曲线上时抛出 ValueError"""
+        if len(data) == 33 and data[0] in (2, 3):
+            Q = self.curve.lift_x(int.from_bytes(data[1:], 'big'), data[0] & 1)
+        elif len(data) == 65 and data[0] == 4:
+            Q = (int.from_bytes(data[1:33], 'big'), int.from_bytes(data[33:], 'big'))
+            if not self.curve.is_on_curve(Q):
+                Q = None
+        else:
+            Q = None
+        if Q is None:
+            raise ValueError("invalid public key encoding")
+        return Q
+
     def hash_message(self, message):
         """消息哈希函数 (SHA-256)"""
         if isinstance(message, str):
@@ -136,10 +510,8 @@ class ECDSA:
         u1 = (e * w) % self.curve.n
         u2 = (r * w) % self.curve.n
         
-        # 计算点 u1*G + u2*Q
-        P1 = self.curve.mul(u1, self.curve.G)
-        P2 = self.curve.mul(u2, Q)
-        R_prime = self.curve.add(P1, P2)
+        # 计算点 u1*G + u2*Q（联合多标量乘）
+        R_prime = self.curve.mul_add(u1, u2, Q)
         
         if R_prime is None:
             return False
@@ -175,6 +547,178 @@ class ECDSA:
         
         return e, (r, s)
 
+    def pretend_many(self, Q, count=None, lanes=256, steps=16, seed=None, workers=None, chunk_size=8192):
+        """批量生成 Satoshi 伪造 (e, (r, s))，count 为 None 时无限产出。
+
+        lanes 条随机游走并行推进：每一步给 R = u·G + v·Q 加上预计算的
+        T_j = a_j·G + b_j·Q（同时 u += a_j, v += b_j），不再做标量乘；
+        全部 lane 的点加与 v^(-1) 各共用一次模逆。workers > 1 时以
+        chunk_size 为单位分发到多个进程，在途任务数有上限。
+        """
+        if count is not None and count < 0:
+            raise ValueError("count must be non-negative")
+        return self._pretend_many(Q, count, lanes, steps, seed, workers, chunk_size)
+
+    def _pretend_many(self, Q, count, lanes, steps, seed, workers, chunk_size):
+        if count == 0:
+            return
+        if not workers or workers <= 1:
+            yield from self._forge_walk(Q, count, lanes, steps, random.Random(seed))
+            return
+        seeds = random.Random(seed)
+        curve = self.curve
+        params = (curve.p, curve.a, curve.b, curve.n, curve.G[0], curve.G[1])
+        chunks = _count() if count is None else range(-(-count // chunk_size))
+        remaining = count
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for _ in chunks:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                if remaining is not None:
+                    remaining -= size
+                pending.append(executor.submit(
+                    _forge_chunk, params, Q, size, lanes, steps, seeds.getrandbits(64)))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _forge_walk(self, Q, count, lanes, steps, rng):
+        curve = self.curve
+        n, p = curve.n, curve.p
+        if count is not None and count <= 0:
+            return
+
+        def fresh(k):
+            # k 个起点 R_i = R_0 + i·D，只做两次标量乘，其余为混合点加；
+            # 落到无穷远点或 v = 0 的起点丢弃后补齐
+            u0, v0, a, b = (rng.randrange(1, n) for _ in range(4))
+            R0, D = curve.mul_add_many([(u0, v0, Q), (a, b, Q)])
+            if R0 is None or D is None:
+                return fresh(k)
+            points = [(R0[0], R0[1], 1)]
+            for _ in range(k - 1):
+                points.append(curve._jacobian_add_affine(points[-1], D))
+            starts = []
+            for i, R in enumerate(curve._to_affine_many(points)):
+                u, v = (u0 + i * a) % n, (v0 + i * b) % n
+                if R is not None and v:
+                    starts.append([u, v, R])
+            return starts + (fresh(k - len(starts)) if len(starts) < k else [])
+
+        # 步长表 T_j = a_j·G + b_j·Q
+        table = [[a, b, T] for a, b, T in fresh(steps)]
+        mask = steps - 1 if steps & (steps - 1) == 0 else None
+        state = fresh(lanes)
+        produced = 0
+        while True:
+            # 1. 输出当前各 lane 的伪造：s = r·v^(-1), e = u·s
+            for lane, v_inv in zip(state, batch_mod_inverse([v for _, v, _ in state], n)):
+                u, _, R = lane
+                r = R[0] % n
+                if r == 0:
+                    continue
+                s = r * v_inv % n
+                yield u * s % n, (r, s)
+                produced += 1
+                if count is not None and produced >= count:
+                    return
+
+            # 2. 各 lane 前进一步；x 坐标相同（R = ±T）或 v 归零的 lane 重新播种
+            picks = []
+            for i, (_, v, R) in enumerate(state):
+                j = R[0] & mask if mask is not None else R[0] % steps
+                a, b, T = table[j]
+                if T[0] == R[0] or (v + b) % n == 0:
+                    state[i] = fresh(1)[0]
+                    picks.append(None)
+                else:
+                    picks.append(table[j])
+            moving = [i for i, t in enumerate(picks) if t is not None]
+            dx_inv = batch_mod_inverse([(picks[i][2][0] - state[i][2][0]) % p for i in moving], p)
+            for i, inv in zip(moving, dx_inv):
+                a, b, (x2, y2) = picks[i]
+                u, v, (x1, y1) = state[i]
+                lam = (y2 - y1) * inv % p
+                x3 = (lam * lam - x1 - x2) % p
+                state[i] = [(u + a) % n, (v + b) % n, (x3, (lam * (x1 - x3) - y1) % p)]
+
+
+# 每个 worker 进程复用一个 ECDSA 实例，G 的预计算表只构建一次
+_worker_ecdsa = None
+_worker_params = None
+
+
+def _forge_chunk(params, Q, size, lanes, steps, seed):
+    global _worker_ecdsa, _worker_params
+    if params != _worker_params:
+        _worker_ecdsa = ECDSA(EllipticCurve(*params))
+        _worker_params = params
+    return list(_worker_ecdsa._forge_walk(Q, size, lanes, steps, random.Random(seed)))
+
+
+# --------- 签名语料流式处理 ---------
+def read_signature_records(path, errors=None):
+    """逐行读取签名记录：e r s recid [pubkey]，前四项为十六进制整数，
+    pubkey 为 SEC1 编码的十六进制串（可省略）；空行与 # 开头的行跳过。
+
+    格式错误的行跳过，不中断读取：每行以 (行号, 原因) 追加到 errors，
+    未给出 errors 时输出到 stderr。"""
+    with open(path, errors='replace') as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            try:
+                if len(fields) < 4:
+                    raise ValueError(f"需要至少 4 个字段，只有 {len(fields)} 个")
+                e, r, s, recid = (int(v, 16) for v in fields[:4])
+                pub = bytes.fromhex(fields[4]) if len(fields) > 4 else None
+            except ValueError as exc:
+                if errors is not None:
+                    errors.append((lineno, str(exc)))
+                else:
+                    print(f"{path}:{lineno}: 跳过格式错误的记录: {exc}", file=sys.stderr)
+                continue
+            yield e, (r, s), recid, pub
+
+
+def process_signature_records(ecdsa, records, chunk_size=1024):
+    """分块处理签名记录，内存占用只与 chunk_size 有关。
+
+    带公钥的记录做批量验证，结果为布尔值；不带公钥的记录做批量公钥恢复，
+    结果为公钥点或 None。逐条产出 (record, result)，顺序与输入一致。
+    """
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        results = [None] * len(chunk)
+        to_verify, to_recover = [], []
+        for i, (e, sig, recid, pub) in enumerate(chunk):
+            if pub is None:
+                to_recover.append(i)
+                continue
+            try:
+                Q = ecdsa.deserialize_public_key(pub)
+            except ValueError:
+                results[i] = False
+                continue
+            to_verify.append((i, Q))
+        checks = ecdsa.verify_batch([(Q, chunk[i][0], chunk[i][1]) for i, Q in to_verify])
+        for (i, _), ok in zip(to_verify, checks):
+            results[i] = ok
+        keys = ecdsa.recover_batch([(chunk[i][0], chunk[i][1], chunk[i][2]) for i in to_recover])
+        for i, Q in zip(to_recover, keys):
+            results[i] = Q
+        yield from zip(chunk, results)
+
+
+def process_signature_file(ecdsa, path, chunk_size=1024, errors=None):
+    """流式处理签名文件，见 read_signature_records / process_signature_records"""
+    return process_signature_records(ecdsa, read_signature_records(path, errors), chunk_size)
+
 
 def main():
     # 初始化椭圆曲线和ECDSA
@@ -219,6 +763,47 @@ def main():
     print("6. 伪造的签名(r, s)和摘要e能通过验证")
     print("\n关键点: 攻击者不需要知道私钥或原始消息，就能创建有效的签名摘要对")
 
+    # 公钥恢复与批量验证
+    print("\n=== 公钥恢复与批量验证 ===")
+    e = ecdsa.hash_message(message)
+    r, s, recid = ecdsa.sign_recoverable(private_key, message)
+    recovered = ecdsa.recover_public_key(e, (r, s), recid)
+    print(f"recid = {recid}, 恢复公钥正确: {recovered == public_key}")
+
+    records = []
+    for i in range(1000):
+        msg = f"tx-{i}"
+        r, s, recid = ecdsa.sign_recoverable(private_key, msg)
+        pub = ecdsa.serialize_public_key(public_key) if i % 2 else None
+        records.append((ecdsa.hash_message(msg), (r, s), recid, pub))
+
+    t1 = time.time()
+    for e, sig, recid, pub in records:
+        if pub is None:
+            ecdsa.recover_public_key(e, sig, recid)
+        else:
+            ecdsa.ver_no_m(public_key, e, sig)
+    t2 = time.time()
+    results = [res for _, res in process_signature_records(ecdsa, records, chunk_size=256)]
+    t3 = time.time()
+    ok = all(res == public_key if pub is None else res for (_, _, _, pub), res in zip(records, results))
+    print(f"逐条处理 {len(records)} 条: {(t2 - t1) * 1000:.2f} ms")
+    print(f"批量处理 {len(records)} 条: {(t3 - t2) * 1000:.2f} ms, 结果正确: {ok}")
+
+    # 批量伪造
+    print("\n=== 批量生成伪造签名 ===")
+    t1 = time.time()
+    for _ in range(20):
+        ecdsa.pretend(public_key)
+    t2 = time.time()
+    forged = list(ecdsa.pretend_many(public_key, count=20000))
+    t3 = time.time()
+    single = (t2 - t1) / 20 * 1e6
+    bulk = (t3 - t2) / len(forged) * 1e6
+    sample = random.sample(forged, 20)
+    ok = all(ecdsa.ver_no_m(public_key, e, sig) for e, sig in sample)
+    print(f"pretend: {single:.1f} us/条, pretend_many: {bulk:.2f} us/条, 加速 {single / bulk:.0f}x, 抽样验证: {ok}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import time
+
+import numpy as np
+
+# 基向量用 dtype=object 的 NumPy 数组保存（元素为 Python 大整数，整数运算精确），
+# Gram–Schmidt 系数用 float64 计算（Schnorr–Euchner 浮点 LLL）：每处理一行都从
+# 精确整数重新算该行的 GS 数据，尺寸约化反复进行直到 |mu| ≤ 1/2，避免误差累积。
+
+
+def _to_float(rows, shift):
+    # 大整数先右移 shift 位再转 float，防止平方范数溢出
+    if shift:
+        rows = rows // (1 << shift)
+    return rows.astype(float)
+
+
+def _shift_for(B):
+    bits = max(abs(int(x)).bit_length() for x in B.flat)
+    return max(0, bits - 400)
+
+
+class GSO:
+    """浮点 Gram–Schmidt 数据：bstar 为正交化向量，norms 为其平方范数，mu 为系数。"""
+
+    def __init__(self, B):
+        d, m = B.shape
+        self.shift = _shift_for(B)
+        self.bstar = np.zeros((d, m))
+        self.norms = np.zeros(d)
+        self.mu = np.eye(d)
+
+    def update_row(self, B, k):
+        """由精确整数行 B[k] 与前 k 个正交向量计算第 k 行的 mu、b*_k 与 |b*_k|^2"""
+        b = _to_float(B[k], self.shift)
+        if k:
+            mu = self.bstar[:k] @ b / self.norms[:k]
+            self.mu[k, :k] = mu
+            b = b - mu @ self.bstar[:k]
+        self.bstar[k] = b
+        self.norms[k] = b @ b
+
+
+def _size_reduce(B, gso, k):
+    """把 b_k 对 b_0..b_{k-1} 做尺寸约化，返回是否变成零向量"""
+    while True:
+        gso.update_row(B, k)
+        mu = gso.mu[k, :k].copy()
+        # 自后向前取整，同步修正浮点 mu；整数行只对非零系数做精确更新
+        steps = []
+        values = mu.tolist()
+        for j in range(k - 1, -1, -1):
+            m = values[j]
+            if -0.51 <= m <= 0.51:
+                continue
+            c = round(m)
+            steps.append((j, c))
+            mu[:j] -= c * gso.mu[j, :j]
+            values[:j] = mu[:j].tolist()
+        if not steps:
+            return gso.norms[k] < 1 and not any(B[k])
+        row = B[k]
+        for j, c in steps:
+            row = row - c * B[j]
+        B[k] = row
+
+
+# 先用较小的 delta 快速把元素规模降下来，再用目标 delta 收尾，总交换次数明显减少
+DELTA_SCHEDULE = (0.5, 0.75)
+
+
+def lll(B, delta=0.99):
+    """LLL 约化，B 为整数行向量矩阵；线性相关的行会被约化为零向量并删除。"""
+    B = np.array(B, dtype=object)
+    for d in DELTA_SCHEDULE:
+        if d < delta:
+            B = _lll_pass(B, d)
+    return _lll_pass(B, delta)
+
+
+def _lll_pass(B, delta):
+    gso = GSO(B)
+    k = 0
+    while k < len(B):
+        if _size_reduce(B, gso, k):
+            # 前 k 行的 GS 数据不受影响，删除零行后重建
+            B = np.delete(B, k, axis=0)
+            gso = GSO(B)
+            for i in range(k):
+                gso.update_row(B, i)
+            continue
+        if k and gso.norms[k] < (delta - gso.mu[k, k - 1] ** 2) * gso.norms[k - 1]:
+            B[[k - 1, k]] = B[[k, k - 1]]
+            k -= 1
+        else:
+            k += 1
+    return B
+
+
+def _enumerate(mu, norms, radius):
+    """Schnorr–Euchner 枚举：mu/norms 描述的格中平方长度 < radius 的最短非零向量系数，没有时返回 None"""
+    n = len(norms)
+    best = None
+    x = [0] * n
+    c = [0.0] * n
+    l = [0.0] * (n + 1)
+    dx = [0] * n
+    ddx = [0] * n
+    x[0] = 1
+    k = 0
+    while True:
+        diff = x[k] - c[k]
+        lk = l[k + 1] + diff * diff * norms[k]
+        if lk < radius:
+            if k:
+                # 下降一层，从中心 c_k 的最近整数开始
+                l[k] = lk
+                k -= 1
+                c[k] = -sum(x[i] * mu[i][k] for i in range(k + 1, n))
+                x[k] = round(c[k])
+                dx[k] = 0
+                ddx[k] = -1 if c[k] >= x[k] else 1
+                continue
+            if lk > 0:
+                radius = lk
+                best = list(x)
+        else:
+            k += 1
+            if k == n:
+                return best
+        # 本层下一个候选：上层全为 0 时只取正方向（避免 ±v 重复），否则围绕中心之字形展开
+        if l[k + 1] == 0:
+            x[k] += 1
+        else:
+            ddx[k] = -ddx[k]
+            dx[k] = ddx[k] - dx[k]
+            x[k] += dx[k]
+
+
+def bkz(B, block_size=10, delta=0.99, max_tours=8):
+    """BKZ 约化：对每个投影块枚举最短向量，比 b*_k 短就插入到 k 处，再用 LLL 消去线性相关。"""
+    B = lll(B, delta)
+    for _ in range(max_tours):
+        changed = False
+        for k in range(len(B) - 1):
+            end = min(k + block_size, len(B))
+            gso = GSO(B)
+            for i in range(end):
+                gso.update_row(B, i)
+            coeffs = _enumerate(gso.mu[k:end, k:end].tolist(), gso.norms[k:end].tolist(),
+                                delta * gso.norms[k])
+            if coeffs is None:
+                continue
+            v = np.array(coeffs, dtype=object) @ B[k:end]
+            B = lll(np.vstack([B[:k], v[None, :], B[k:]]), delta)
+            changed = True
+        if not changed:
+            break
+    return B
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(1)
+    d = 40
+    # 随机 knapsack 型格：第一列为大随机数，其余为单位阵
+    big = [int(x) for x in rng.integers(1, 2 ** 62, size=d)]
+    B = np.array([[big[i] * (1 << 200)] + [1 if j == i else 0 for j in range(d)] for i in range(d)], dtype=object)
+    t1 = time.time()
+    R = lll(B)
+    t2 = time.time()
+    print(f"LLL d={d}: {(t2 - t1) * 1000:.2f} ms, 最短行长度约 2^{max(abs(int(x)) for x in R[0]).bit_length()}")
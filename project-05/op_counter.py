@@ -0,0 +1,135 @@
+import time
+from contextlib import contextmanager
+
+OP_FIELDS = ("mul", "sqr", "inv", "dbl", "add")
+
+
+def op_cost(cost):
+    """在底层方法上声明其名义开销，供 count_ops 使用。
+
+    cost 为固定字典，或以方法参数（不含 self）调用、返回字典的函数，
+    按公式实际的域乘法 / 平方次数填写（test_op_counter.py 逐一核对）。
+    装饰器只给函数加一个属性，不做包装，热路径上没有额外开销。
+    """
+    def mark(method):
+        method.op_cost = cost
+        return method
+    return mark
+
+
+def op_costs(cls):
+    """cls 及其基类中用 op_cost 声明过开销的方法：{方法名: cost}"""
+    costs = {}
+    for klass in reversed(cls.__mro__):
+        for name, attr in vars(klass).items():
+            cost = getattr(attr, "op_cost", None)
+            if cost is not None:
+                costs[name] = cost
+    return costs
+
+
+class OpCounter:
+    """记录域乘法、平方、求逆以及点倍点、点加的次数。
+
+    total 为全部计数；per_call 按最外层的高层调用（sign、verify 等）汇总，
+    嵌套调用只计入最外层。
+    """
+
+    def __init__(self):
+        self.total = dict.fromkeys(OP_FIELDS, 0)
+        self.per_call = {}
+        self._depth = 0
+
+    def bump(self, costs):
+        for field, n in costs.items():
+            self.total[field] += n
+
+    def snapshot(self):
+        return dict(self.total)
+
+    def reset(self):
+        self.total = dict.fromkeys(OP_FIELDS, 0)
+        self.per_call = {}
+
+    def _record_call(self, name, before):
+        entry = self.per_call.setdefault(name, dict(calls=0, **dict.fromkeys(OP_FIELDS, 0)))
+        entry["calls"] += 1
+        for field in OP_FIELDS:
+            entry[field] += self.total[field] - before[field]
+
+
+def _cost_wrapper(counter, method, cost):
+    if callable(cost):
+        def wrapper(*args, **kwargs):
+            counter.bump(cost(*args, **kwargs))
+            return method(*args, **kwargs)
+    else:
+        def wrapper(*args, **kwargs):
+            counter.bump(cost)
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def _entry_wrapper(counter, method, name):
+    def wrapper(*args, **kwargs):
+        if counter._depth:
+            return method(*args, **kwargs)
+        before = counter.snapshot()
+        counter._depth += 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            counter._depth -= 1
+            counter._record_call(name, before)
+    return wrapper
+
+
+@contextmanager
+def count_ops(*targets):
+    """在 with 块内为 targets（SM2、EllipticCurve、ECDSA 实例）开启运算计数。
+
+    每个类用 op_cost 在各底层方法上声明名义开销，在 OP_ENTRY_POINTS
+    中列出按调用汇总的高层方法。
+    计数通过在实例上临时覆盖这些方法实现，with 块结束后恢复原方法，
+    因此未开启时热路径上没有任何额外开销。
+    """
+    counter = OpCounter()
+    patched = []
+    try:
+        for obj in targets:
+            if "_op_counter" in vars(obj):
+                raise RuntimeError("object is already being counted")
+            obj._op_counter = counter
+            patched.append((obj, "_op_counter"))
+            for name, cost in op_costs(type(obj)).items():
+                setattr(obj, name, _cost_wrapper(counter, getattr(obj, name), cost))
+                patched.append((obj, name))
+            for name in getattr(type(obj), "OP_ENTRY_POINTS", ()):
+                setattr(obj, name, _entry_wrapper(counter, getattr(obj, name), name))
+                patched.append((obj, name))
+        yield counter
+    finally:
+        for obj, name in reversed(patched):
+            if name in vars(obj):
+                delattr(obj, name)
+
+
+if __name__ == "__main__":
+    from SM2_basic import SM2 as SM2Basic
+    from SM2_optimized import SM2 as SM2Optimized
+    from SM2_POC import SM2 as SM2POC
+
+    msg = b"operation count demo"
+    for label, cls in (("basic", SM2Basic), ("POC", SM2POC), ("optimized", SM2Optimized)):
+        sm2 = cls()
+        priv, pub = sm2.generate_keypair()
+        with count_ops(sm2) as ops:
+            t1 = time.time()
+            ciphertext = sm2.encrypt(pub, msg)
+            sm2.decrypt(priv, ciphertext)
+            if hasattr(sm2, "sign"):
+                sm2.verify(pub, msg, sm2.sign(priv, msg))
+            t2 = time.time()
+        print(f"== {label} ({(t2 - t1) * 1000:.2f} ms) ==")
+        for name, counts in ops.per_call.items():
+            print(f"  {name:<10} " + " ".join(f"{k}={v}" for k, v in counts.items()))
@@ -0,0 +1,99 @@
+import random
+
+import Satoshi_signature_forgery as satoshi
+from SM2_basic import SM2 as SM2Basic
+from SM2_optimized import SM2 as SM2Optimized
+from SM2_POC import SM2 as SM2POC
+from op_counter import count_ops, op_costs
+
+SMALL = 1 << 8  # 与小常数相乘（2X、3X、8γ 等）不计入域乘法
+
+
+class Fe(int):
+    """统计乘法 / 平方次数的整数，运算结果仍为 Fe"""
+    counts = {"mul": 0, "sqr": 0}
+
+    def __add__(self, other):
+        return Fe(int(self) + int(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Fe(int(self) - int(other))
+
+    def __rsub__(self, other):
+        return Fe(int(other) - int(self))
+
+    def __neg__(self):
+        return Fe(-int(self))
+
+    def __mod__(self, other):
+        return Fe(int(self) % int(other))
+
+    def __mul__(self, other):
+        a, b = abs(int(self)), abs(int(other))
+        if a >= SMALL and b >= SMALL:
+            # 3X * X 这类写法：一个因子是另一个的小常数倍，也是平方
+            square = a == b or (a % b == 0 and a // b < SMALL) or (b % a == 0 and b // a < SMALL)
+            Fe.counts["sqr" if square else "mul"] += 1
+        return Fe(int(self) * int(other))
+
+    __rmul__ = __mul__
+
+    def __pow__(self, e, m=None):
+        if e == 2 and m is None:
+            return self * self
+        return Fe(pow(int(self), e, m))  # 模逆，由 inv 单独计数
+
+
+def _fe(p):
+    return Fe(random.randrange(SMALL, p))
+
+
+# 各底层方法的测试参数：雅可比点 / 仿射点均取随机坐标（公式本身不检查点是否在曲线上）
+def _arguments(name, p):
+    jac = lambda: (_fe(p), _fe(p), _fe(p))
+    aff = lambda: (_fe(p), _fe(p))
+    if name in ("_jacobian_double", "_jacobian_to_affine"):
+        return [(jac(),)]
+    if name == "_jacobian_add":
+        return [(jac(), jac())]
+    if name in ("_jacobian_add_mixed", "_jacobian_add_affine"):
+        return [(jac(), aff())]
+    if name == "_batch_to_affine":
+        return [([jac() for _ in range(3)],)]
+    if name == "_batch_inverse":
+        return [([_fe(p) for _ in range(3)],)]
+    if name in ("_point_add", "add"):
+        Q = aff()
+        return [(aff(), aff()), (Q, Q)]
+    raise AssertionError(f"no test arguments for {name}")
+
+
+def _curves():
+    return [SM2Basic(), SM2POC(), SM2Optimized(),
+            satoshi.EllipticCurve(satoshi.P, satoshi.A, satoshi.B, satoshi.N, satoshi.Gx, satoshi.Gy)]
+
+
+def test_declared_costs_match_formulas():
+    # count_ops 按声明累计的 mul / sqr（含嵌套调用的底层方法）必须等于公式实际执行的次数
+    for curve in _curves():
+        for name in op_costs(type(curve)):
+            if name in ("_mod_inverse", "mul_inv"):
+                continue  # 求逆整体计为 inv
+            for args in _arguments(name, curve.p):
+                Fe.counts = {"mul": 0, "sqr": 0}
+                with count_ops(curve) as ops:
+                    getattr(curve, name)(*args)
+                actual = {k: v for k, v in Fe.counts.items() if v}
+                declared = {k: ops.total[k] for k in ("mul", "sqr") if ops.total[k]}
+                assert actual == declared, f"{type(curve).__module__}.{name}: declared {declared}, formula does {actual}"
+
+
+def test_count_ops_restores_methods():
+    sm2 = SM2Optimized()
+    d, P = sm2.generate_keypair()
+    with count_ops(sm2) as ops:
+        sm2.verify(P, b"msg", sm2.sign(d, b"msg"))
+    assert ops.per_call["sign"]["calls"] == 1 and ops.total["mul"] > 0
+    assert "_jacobian_double" not in vars(sm2)
@@ -0,0 +1,48 @@
+import hashlib
+
+from SM2_optimized import SM2
+
+
+def _cache(tmp_path):
+    path = str(tmp_path / "comb.bin")
+    sm2 = SM2(comb_teeth=4, comb_tables=2, comb_cache=path)
+    return sm2, path, sm2._load_or_build_comb()
+
+
+def _rewrite(path, edit):
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    data = edit(data)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_cache_round_trip(tmp_path):
+    sm2, path, tables = _cache(tmp_path)
+    assert sm2._read_comb_cache(path, sm2._comb_cache_header()) == tables
+
+
+def test_corrupted_cache_is_rebuilt(tmp_path):
+    sm2, path, tables = _cache(tmp_path)
+    header = sm2._comb_cache_header()
+
+    def flip(data):
+        data[len(header) + 100] ^= 1
+        return data
+
+    def truncate_and_pad(data):
+        return data[:len(data) // 2] + bytes(len(data) - len(data) // 2)
+
+    def tamper_with_digest(data):
+        # 把 T_0[1] 换成 2G 并重算摘要：摘要通过，抽查必须拦下
+        x, y = sm2._point_mul(2, sm2.G)
+        data[len(header):len(header) + 64] = x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+        data[-32:] = hashlib.sha256(bytes(data[:-32])).digest()
+        return data
+
+    for edit in (flip, truncate_and_pad, tamper_with_digest):
+        _rewrite(path, edit)
+        assert sm2._read_comb_cache(path, header) is None
+        assert sm2._load_or_build_comb() == tables
+        # 重建后缓存文件恢复可用
+        assert sm2._read_comb_cache(path, header) == tables
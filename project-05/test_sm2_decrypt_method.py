@@ -0,0 +1,18 @@
+from SM2_optimized import SM2
+
+
+def test_decrypt_defaults_to_ladder():
+    # 默认 variable_base="wnaf" 只作用于加密；解密的私钥标量走梯子法，C1 不进缓存
+    sm2 = SM2()
+    d, P = sm2.generate_keypair()
+    ciphertexts = [sm2.encrypt(P, b"envelope") for _ in range(3)]
+    calls = []
+    ladder, wnaf = sm2._montgomery_ladder, sm2._point_mul_wnaf
+    sm2._montgomery_ladder = lambda k, Q: calls.append("ladder") or ladder(k, Q)
+    sm2._point_mul_wnaf = lambda k, Q, cache=True: calls.append("wnaf") or wnaf(k, Q, cache)
+    assert all(sm2.decrypt(d, c) == b"envelope" for c in ciphertexts)
+    assert calls == ["ladder"] * 3
+    assert sm2.decrypt(d, ciphertexts[0], method="wnaf") == b"envelope"
+    assert calls[-1] == "wnaf"
+    cached = set(sm2.point_cache._seen) | set(sm2.point_cache._tables)
+    assert cached == {P}
@@ -0,0 +1,17 @@
+import SM2_nonce_scanner as scanner
+
+
+def test_scan_skips_malformed_lines(tmp_path):
+    # 在演示语料中混入格式错误的行：扫描照常完成，错误以 文件:行号 报告
+    path = tmp_path / "corpus.txt"
+    planted = scanner._write_demo_corpus(str(path), 500)
+    lines = path.read_text().splitlines(keepends=True)
+    lines[10:10] = ["02ab 1 2\n", "zz 1 2 3\n", "02ab 1 2 3 4\n", "02ab 1 xyz 3\n"]
+    path.write_text("".join(lines))
+
+    for workers in (1, 2):
+        errors = []
+        findings = list(scanner.scan([str(path)], shards=4, workers=workers, errors=errors))
+        assert {d for f in findings for d in f["keys"].values()} == planted
+        assert [e.rsplit(":", 2)[1] for e in errors] == ["11", "12", "13", "14"]
+        assert all(e.startswith(f"{path}:") for e in errors)
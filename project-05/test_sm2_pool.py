@@ -0,0 +1,43 @@
+import pickle
+
+from SM2_optimized import SM2
+from SM2_pool import SM2Pool
+
+
+def test_key_objects_pickle():
+    sm2 = SM2()
+    d, P = sm2.generate_keypair()
+    priv = sm2.private_key(d)
+    priv2 = pickle.loads(pickle.dumps(priv))
+    assert priv2.d == priv.d and priv2.public_key.z_a == priv.public_key.z_a
+    # 重建的哈希状态与原对象给出相同的 e
+    assert priv2.digest(b"msg") == priv.digest(b"msg")
+
+
+def test_pool_with_key_objects():
+    # 密钥对象经进程池往返：worker 中签名，主进程与 worker 中验签
+    sm2 = SM2()
+    d, P = sm2.generate_keypair()
+    priv, pub = sm2.private_key(d), sm2.public_key(P)
+    messages = [f"record-{i}".encode() for i in range(8)]
+    with SM2Pool(workers=2, backend="process", chunk_size=3) as pool:
+        signatures = pool.sign(priv, messages)
+        assert all(pool.verify([(pub, m, sig) for m, sig in zip(messages, signatures)]))
+        ciphertexts = pool.encrypt(pub, messages)
+        assert pool.decrypt(priv, ciphertexts) == messages
+    assert all(sm2.verify(pub, m, sig) for m, sig in zip(messages, signatures))
+
+
+def test_thread_pools_keep_their_own_instance():
+    # 两个线程池参数不同：各自的实例互不覆盖
+    sm2 = SM2()
+    d, P = sm2.generate_keypair()
+    messages = [f"record-{i}".encode() for i in range(6)]
+    with SM2Pool(workers=2, backend="thread", chunk_size=2, variable_base="ladder") as ladder_pool, \
+            SM2Pool(workers=2, backend="thread", chunk_size=2, comb_teeth=4) as comb_pool:
+        assert ladder_pool._sm2 is not comb_pool._sm2
+        assert ladder_pool._sm2.variable_base == "ladder" and ladder_pool._sm2.comb_teeth == 8
+        assert comb_pool._sm2.variable_base == "wnaf" and comb_pool._sm2.comb_teeth == 4
+        signatures = ladder_pool.sign(d, messages)
+        assert all(comb_pool.verify([(P, m, sig) for m, sig in zip(messages, signatures)]))
+        assert comb_pool.decrypt(d, ladder_pool.encrypt(P, messages)) == messages
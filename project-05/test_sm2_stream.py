@@ -0,0 +1,50 @@
+import io
+import os
+
+import pytest
+
+from SM2_optimized import SM2
+
+
+class ShortReader(io.RawIOBase):
+    """每次 readinto 最多返回 step 字节，模拟管道 / 套接字的短读"""
+
+    def __init__(self, data, step):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.step = step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n = min(len(buf), self.step, len(self.data) - self.pos)
+        buf[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+@pytest.mark.parametrize("step", [1, 40, 100])
+def test_stream_with_short_reads(step):
+    sm2 = SM2()
+    d, P = sm2.generate_keypair()
+    msg = os.urandom(1000)
+
+    dst = io.BytesIO()
+    sm2.encrypt_stream(P, ShortReader(msg, step), dst, chunk_size=256)
+    ciphertext = dst.getvalue()
+    # 与一次性接口互通
+    assert sm2.decrypt(d, ciphertext) == msg
+
+    out = io.BytesIO()
+    assert sm2.decrypt_stream(d, ShortReader(ciphertext, step), out, chunk_size=256) == len(msg)
+    assert out.getvalue() == msg
+
+
+def test_stream_rejects_small_chunk_size():
+    sm2 = SM2()
+    d, P = sm2.generate_keypair()
+    with pytest.raises(ValueError, match="chunk_size"):
+        sm2.encrypt_stream(P, io.BytesIO(b"abc"), io.BytesIO(), chunk_size=16)
+    with pytest.raises(ValueError, match="chunk_size"):
+        sm2.decrypt_stream(d, io.BytesIO(sm2.encrypt(P, b"abc")), io.BytesIO(), chunk_size=16)
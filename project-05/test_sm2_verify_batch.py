@@ -0,0 +1,23 @@
+from SM2_optimized import SM2
+
+
+def test_verify_batch_matches_verify():
+    # 标准 (r, s)、可恢复 (r, s, v) 签名与密钥对象混合，坏签名必须逐条定位
+    sm2 = SM2()
+    items = []
+    for n in (1, 2, 6):
+        d, P = sm2.generate_keypair()
+        priv, pub = sm2.private_key(d), sm2.public_key(P)
+        for j in range(n):
+            msg = f"msg-{n}-{j}".encode()
+            items.append((P, msg, sm2.sign(d, msg)))
+            items.append((pub, msg, sm2.sign(priv, msg)))
+            items.append((P, msg, sm2.sign_recoverable(d, msg)))
+    for i in (0, 5, len(items) - 2):
+        P, msg, sig = items[i]
+        items[i] = (P, msg, (sig[0], (sig[1] + 1) % sm2.n) + tuple(sig[2:]))
+    items.append((items[1][0], b"other message", items[1][2]))
+
+    expected = [sm2.verify(P, msg, sig[:2]) for P, msg, sig in items]
+    assert expected.count(False) == 4
+    assert sm2.verify_batch(items) == expected
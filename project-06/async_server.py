@@ -0,0 +1,387 @@
+# async_server.py
+# Long-running multi-client Password Checkup server (P2).
+#
+# The k2-blinded leaked set is computed once at startup and shared by all sessions, or
+# mapped from a blinded_store.py directory (--store DIR) so that startup does no blinding.
+# Per-session CPU work (blinding the client's points, decryption of the sum) runs in a
+# process pool so the event loop only does I/O. Count encryption uses precomputed
+# obfuscators from paillier_pool.py, which leaves one modular multiplication per count.
+import asyncio
+import json
+import os
+import random
+import signal
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from phe import paillier
+
+import packing
+import wire
+from blinded_store import BlindedStore
+from paillier_pool import ObfuscatorPool, apply_obfuscators, make_obfuscators
+from server import curve, hash_to_scalar, point_to_hex, hex_to_point
+
+HOST = '127.0.0.1'
+PORT = 54545
+
+READ_TIMEOUT = 30        # seconds allowed for each message from the client
+SESSION_TIMEOUT = 300    # seconds allowed for a whole session
+MAX_SESSIONS = 64        # sessions doing work at the same time; others wait (backpressure)
+MAX_POINTS = 1 << 20     # largest ROUND1 accepted
+MAX_JSON = 64 << 20      # largest JSON message accepted
+CHUNK = 512              # items per executor job
+APPLY_THREADS = 2        # threads for the pool's one-multiplication-per-item jobs
+POOL_LOW_WATERMARK = 1024   # obfuscator pool refills below this depth...
+POOL_HIGH_WATERMARK = 8192  # ...up to this one; bounds the pool's memory whatever the corpus size
+
+# what malformed client input can raise while it is parsed; such sessions count as failed
+PROTOCOL_ERRORS = (ValueError, KeyError, TypeError, AttributeError, struct.error)
+
+
+# --- executor jobs (module level so they can run in worker processes) ---
+def _blind_identifiers(k2, identifiers):
+    # k2 * (H(w) * G) = (k2 * H(w) mod order) * G: one scalar multiplication per identifier
+    order = curve.field.n
+    return [wire.encode_point((k2 * hash_to_scalar(w) % order) * curve.g) for w in identifiers]
+
+
+def _blind_points(k2, encoded):
+    return [wire.encode_point(k2 * wire.decode_point(p)) for p in encoded]
+
+
+def _rerandomize_records(nsquare, record_size, data, obfuscators):
+    # store records are (point, ciphertext); multiply in a fresh r^n so sessions never share ciphertexts
+    pairs = []
+    for off, r in zip(range(0, len(data), record_size), obfuscators):
+        c = int.from_bytes(data[off + wire.POINT_SIZE:off + record_size], 'big')
+        pairs.append((data[off:off + wire.POINT_SIZE], c * r % nsquare))
+    return pairs
+
+
+def _decrypt(priv, pub, c, exponent):
+    return priv.decrypt(paillier.EncryptedNumber(pub, c, exponent))
+
+
+def _decrypt_packed(priv, enc_sums, width):
+    return packing.unpack_sum([priv.raw_decrypt(c) for c in enc_sums], width)
+
+
+# --- JSON framing on asyncio streams (same layout as send_json / recv_json) ---
+async def read_json(reader):
+    ln = int.from_bytes(await reader.readexactly(4), 'big')
+    if ln > MAX_JSON:
+        raise ValueError("message too large")
+    msg = json.loads(await reader.readexactly(ln))
+    if not isinstance(msg, dict):
+        raise ValueError("protocol error: message is not a JSON object")
+    return msg
+
+
+def write_json(writer, obj):
+    data = json.dumps(obj).encode()
+    writer.write(len(data).to_bytes(4, 'big') + data)
+
+
+def json_round1_points(msg):
+    """encoded points of a JSON ROUND1, checked before any of them is converted"""
+    if msg.get('type') != 'ROUND1':
+        raise ValueError("protocol error: expecting ROUND1")
+    points = msg.get('points')
+    if not isinstance(points, list):
+        raise ValueError("protocol error: ROUND1 points must be a list")
+    if len(points) > MAX_POINTS:
+        raise ValueError("too many points")
+    encoded = []
+    for d in points:
+        if not isinstance(d, dict):
+            raise ValueError("protocol error: ROUND1 point must be an object")
+        pt = hex_to_point(d)
+        if pt is None:
+            raise ValueError("point at infinity")
+        encoded.append(wire.encode_point(pt))
+    return encoded
+
+
+class CheckupServer:
+    def __init__(self, leaked_pairs=(), executor=None, max_sessions=MAX_SESSIONS,
+                 read_timeout=READ_TIMEOUT, session_timeout=SESSION_TIMEOUT, store=None, pool_path=None,
+                 pool_low=POOL_LOW_WATERMARK, pool_high=POOL_HIGH_WATERMARK):
+        self.leaked_pairs = list(leaked_pairs)
+        self.store = store
+        self.executor = executor or ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        self.read_timeout = read_timeout
+        self.session_timeout = session_timeout
+        self._sessions = asyncio.Semaphore(max_sessions)
+        if store is not None:
+            self.paillier_pub, self.paillier_priv = store.paillier_pub, store.paillier_priv
+        else:
+            self.k2 = random.SystemRandom().randrange(2, curve.field.n - 1)
+            self.paillier_pub, self.paillier_priv = paillier.generate_paillier_keypair()
+        self.blinded = None
+        self.packing = None  # (slots, width); packed mode needs the plaintext counts, so not with a store
+        # fixed depth: sessions larger than the pool compute the shortfall in the executor;
+        # persisted next to the store by default
+        if pool_path is None and store is not None:
+            pool_path = os.path.join(store.path, 'obfuscators.bin')
+        self.pool = ObfuscatorPool(self.paillier_pub, low_watermark=pool_low,
+                                   high_watermark=pool_high, path=pool_path)
+        # pool multiplications get their own threads, apart from the loop's default executor
+        self.apply_executor = ThreadPoolExecutor(max_workers=APPLY_THREADS, thread_name_prefix="apply")
+        self._active = set()
+        self.stats = {"sessions": 0, "completed": 0, "failed": 0, "timeouts": 0}
+
+    async def _map(self, func, args, items):
+        """run func(*args, chunk) over CHUNK-sized pieces of items in the executor"""
+        loop = asyncio.get_running_loop()
+        jobs = [loop.run_in_executor(self.executor, func, *args, items[i:i + CHUNK])
+                for i in range(0, len(items), CHUNK)]
+        results = []
+        for part in await asyncio.gather(*jobs):
+            results.extend(part)
+        return results
+
+    async def prepare(self):
+        """blind the leaked set once; every session reuses these points"""
+        t1 = time.time()
+        self.blinded = await self._map(_blind_identifiers, (self.k2,), [w for w, _ in self.leaked_pairs])
+        self.nudes = [self.pool.nude(t) for _, t in self.leaked_pairs]
+        if self.leaked_pairs:
+            self.packing = packing.packing_params(self.paillier_pub.n, max(t for _, t in self.leaked_pairs),
+                                                  len(self.leaked_pairs))
+        print(f"Blinded {len(self.blinded)} leaked identifiers in {time.time() - t1:.2f} s.")
+
+    async def _obfuscators(self, count):
+        """count unused obfuscators: from the pool, the shortfall computed in the executor"""
+        items = self.pool.take_many(count)
+        short = count - len(items)
+        if short:
+            loop = asyncio.get_running_loop()
+            n = self.paillier_pub.n
+            jobs = [loop.run_in_executor(self.executor, make_obfuscators, n, min(CHUNK, short - i))
+                    for i in range(0, short, CHUNK)]
+            for part in await asyncio.gather(*jobs):
+                items.extend(part)
+        return items
+
+    async def _apply_chunks(self, func, chunks):
+        # a few thousand multiplications per job: cheap enough for threads,
+        # and the event loop still gets the GIL between them
+        loop = asyncio.get_running_loop()
+        results = []
+        for part in await asyncio.gather(*(loop.run_in_executor(self.apply_executor, func, *args)
+                                           for args in chunks)):
+            results.extend(part)
+        return results
+
+    async def _encrypted_counts(self):
+        obfs = await self._obfuscators(len(self.nudes))
+        nsquare = self.paillier_pub.nsquare
+        return await self._apply_chunks(apply_obfuscators, [
+            (nsquare, self.nudes[i:i + CHUNK], obfs[i:i + CHUNK]) for i in range(0, len(obfs), CHUNK)])
+
+    async def _store_pairs(self, snap):
+        obfs = await self._obfuscators(snap.count)
+        step = CHUNK * snap.record_size
+        return await self._apply_chunks(_rerandomize_records, [
+            (snap.paillier_pub.nsquare, snap.record_size, bytes(snap.records[off:off + step]),
+             obfs[off // snap.record_size:off // snap.record_size + CHUNK])
+            for off in range(0, len(snap.records), step)])
+
+    async def _packed_rounds(self, reader, writer, fmt, Z):
+        """ROUND2/ROUND3 with `slots` counts per ciphertext (see packing.py)"""
+        slots, width = self.packing
+        pub = self.paillier_pub
+        order = list(range(len(self.leaked_pairs)))
+        random.SystemRandom().shuffle(order)
+        plaintexts = packing.pack_counts([self.leaked_pairs[i][1] for i in order], slots, width)
+        nudes = [pub.raw_encrypt(p, r_value=1) for p in plaintexts]
+        obfs = await self._obfuscators(len(nudes))
+        ciphertexts = await self._apply_chunks(apply_obfuscators, [
+            (pub.nsquare, nudes[i:i + CHUNK], obfs[i:i + CHUNK]) for i in range(0, len(nudes), CHUNK)])
+        points = [self.blinded[i] for i in order]
+        if fmt == "binary":
+            body = wire.encode_round2_packed(Z, points, ciphertexts, pub.n, slots, width)
+            writer.write(wire.frame_header(wire.ROUND2P, len(body)))
+            writer.write(body)
+        else:
+            write_json(writer, {
+                "type": "ROUND2",
+                "packing": {"slots": slots, "width": width},
+                "Z": [point_to_hex(wire.decode_point(z)) for z in Z],
+                "points": [point_to_hex(wire.decode_point(p)) for p in points],
+                "ciphertexts": ciphertexts,
+                "paillier_n": pub.n
+            })
+        await writer.drain()
+
+        if fmt == "binary":
+            max_size = wire.WIDTH.size + wire.COUNT.size + slots * wire.ciphertext_width(pub.n)
+            _, body = await self._read(wire.read_frame(reader, wire.ROUND3P, max_size))
+            enc_sums = wire.decode_round3_packed(body)
+        else:
+            msg3 = await self._read(read_json(reader))
+            if msg3.get('type') != 'ROUND3' or not isinstance(msg3.get('enc_sums'), list):
+                raise ValueError("protocol error: expecting ROUND3")
+            enc_sums = [int(c) for c in msg3['enc_sums']]
+        if len(enc_sums) != slots:
+            raise ValueError("protocol error: expecting one sum per slot")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _decrypt_packed, self.paillier_priv, enc_sums, width)
+
+    async def _read(self, coro):
+        return await asyncio.wait_for(coro, self.read_timeout)
+
+    async def _session(self, reader, writer):
+        # --- Optional HELLO, as in server.py ---
+        msg = await self._read(read_json(reader))
+        fmt = "json"
+        packed = False
+        if msg.get('type') == 'HELLO':
+            fmt = wire.choose_format(msg.get('formats', []))
+            packed = bool(msg.get('packing')) and self.packing is not None
+            write_json(writer, {"type": "HELLO", "format": fmt, "version": wire.VERSION, "packing": packed})
+            await writer.drain()
+            msg = None
+
+        # --- ROUND1 ---
+        if fmt == "binary":
+            max_size = wire.COUNT.size + MAX_POINTS * wire.POINT_SIZE
+            _, body = await self._read(wire.read_frame(reader, wire.ROUND1, max_size))
+            points = wire.decode_round1(body)
+        else:
+            if msg is None:
+                msg = await self._read(read_json(reader))
+            points = json_round1_points(msg)
+
+        # --- ROUND2: blind the client's points, encrypt the counts (fresh per session) ---
+        pub = self.paillier_pub
+        if packed:
+            Z = await self._map(_blind_points, (self.k2,), points)
+            random.SystemRandom().shuffle(Z)
+            return await self._packed_rounds(reader, writer, fmt, Z)
+        if self.store is not None:
+            # pick up appends and k2 rotations committed since the last session
+            self.store.refresh()
+            snap = self.store.snapshot()
+            Z, pairs = await asyncio.gather(
+                self._map(_blind_points, (snap.k2,), points),
+                self._store_pairs(snap))
+        else:
+            Z, ciphertexts = await asyncio.gather(
+                self._map(_blind_points, (self.k2,), points),
+                self._encrypted_counts())
+            pairs = list(zip(self.blinded, ciphertexts))
+        random.SystemRandom().shuffle(Z)
+        random.SystemRandom().shuffle(pairs)
+        if fmt == "binary":
+            body = wire.encode_round2(Z, pairs, pub.n)
+            writer.write(wire.frame_header(wire.ROUND2, len(body)))
+            writer.write(body)
+        else:
+            write_json(writer, {
+                "type": "ROUND2",
+                "Z": [point_to_hex(wire.decode_point(z)) for z in Z],
+                "enc_pairs": [(point_to_hex(wire.decode_point(p)), {"c": c, "exponent": 0}) for p, c in pairs],
+                "paillier_n": pub.n
+            })
+        await writer.drain()  # backpressure: wait until the client has taken the data
+
+        # --- ROUND3 ---
+        if fmt == "binary":
+            max_size = wire.WIDTH.size + wire.ciphertext_width(pub.n)
+            _, body = await self._read(wire.read_frame(reader, wire.ROUND3, max_size))
+            c, exponent = wire.decode_round3(body), 0
+        else:
+            msg3 = await self._read(read_json(reader))
+            if msg3.get('type') != 'ROUND3' or not isinstance(msg3.get('enc_sum'), dict):
+                raise ValueError("protocol error: expecting ROUND3")
+            c, exponent = int(msg3['enc_sum']['c']), int(msg3['enc_sum'].get('exponent', 0))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _decrypt, self.paillier_priv, pub, c, exponent)
+
+    async def handle(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        self._active.add(asyncio.current_task())
+        try:
+            try:
+                await asyncio.wait_for(self._sessions.acquire(), self.read_timeout)
+            except asyncio.TimeoutError:
+                print(f"{addr}: server busy, closing connection")
+                self.stats["timeouts"] += 1
+                return
+            self.stats["sessions"] += 1
+            try:
+                SJ = await asyncio.wait_for(self._session(reader, writer), self.session_timeout)
+                self.stats["completed"] += 1
+                print(f"{addr}: intersection-sum SJ = {SJ}")
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                print(f"{addr}: session timed out")
+            except asyncio.CancelledError:
+                print(f"{addr}: session cancelled (server shutting down)")
+            except (asyncio.IncompleteReadError, ConnectionError) + PROTOCOL_ERRORS as e:
+                self.stats["failed"] += 1
+                print(f"{addr}: session failed: {e!r}")
+            finally:
+                self._sessions.release()
+        finally:
+            self._active.discard(asyncio.current_task())
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host=HOST, port=PORT):
+        if self.store is not None:
+            print(f"Mapped {self.store.count} blinded records from {self.store.path}.")
+        elif self.blinded is None:
+            await self.prepare()
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Listening on {host}:{port} ...")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # stop in-flight sessions before the caller shuts the executor down
+            for task in list(self._active):
+                task.cancel()
+            await asyncio.gather(*self._active, return_exceptions=True)
+
+    def close(self):
+        """stop the obfuscator pool (persisting unused obfuscators) and the apply threads"""
+        self.pool.close()
+        self.apply_executor.shutdown(wait=False)
+
+
+async def main(leaked_pairs, store=None):
+    # SIGTERM takes the same path as Ctrl-C, so executor workers and the obfuscator pool shut down cleanly
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        server = CheckupServer(leaked_pairs, executor, store=store)
+        try:
+            await server.serve()
+        finally:
+            server.close()  # persists unused obfuscators (with --store)
+
+
+if __name__ == "__main__":
+    store = None
+    if len(sys.argv) > 2 and sys.argv[1] == "--store":
+        store = BlindedStore(sys.argv[2])
+    leaked = [
+        ("pw:qwerty", 1000),
+        ("pw:123456", 5000),
+        ("pw:letmein", 800),
+        ("pw:password", 3000)
+    ]
+    try:
+        asyncio.run(main(leaked, store))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        sys.exit(0)
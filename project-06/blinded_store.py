@@ -0,0 +1,383 @@
+# blinded_store.py
+# On-disk store of the server's k2-blinded leaked set.
+#
+# A store is a directory holding
+#   keys.json          k2, the Paillier key pair and the current generation
+#   records.<g>.bin    header | fixed-width records: compressed k2*H(w)*G (33 bytes) | Paillier ciphertext
+#   index.<g>.bin      (fingerprint, record number) pairs sorted by fingerprint, 16 bytes each
+# Records use the same layout as an enc_pair in a binary ROUND2 frame.
+#
+# Records that a reader may have mapped are never modified. New records go past the indexed
+# ones and the index is the commit point of such an append: records past the indexed count
+# are leftovers of an interrupted append and are overwritten by the next one. Replacing the
+# count of a stored identifier, and a k2 rotation, write the next generation beside the
+# current one and switch by replacing keys.json, so a reader always sees a matching
+# (k2, records, index) set. Appends and rotations take an exclusive lock; readers (the
+# server) only map files and never block writers.
+import argparse
+import fcntl
+import heapq
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from phe import paillier
+
+import wire
+from server import curve, hash_to_scalar
+
+MAGIC = b'PCBS'
+STORE_VERSION = 1
+FILE_HEADER = struct.Struct('>4sBxH')  # magic | version | ciphertext width
+INDEX_ENTRY = struct.Struct('>QQ')
+KEYS = 'keys.json'
+LOCK = 'lock'
+CHUNK = 4096  # records per batch job
+
+Snapshot = namedtuple('Snapshot', 'k2 paillier_pub records record_size count')
+
+
+def _fingerprint(point):
+    return int.from_bytes(point[1:9], 'big')
+
+
+# --- batch jobs (module level so they can run in worker processes) ---
+def _blind_chunk(k2, pub, pairs):
+    # k2 * (H(w) * G) = (k2 * H(w) mod order) * G
+    order = curve.field.n
+    return [(wire.encode_point((k2 * hash_to_scalar(w) % order) * curve.g), pub.encrypt(t).ciphertext())
+            for w, t in pairs]
+
+
+def _reblind_chunk(factor, record_size, data, first):
+    """multiply every point in a block of records by factor; returns (records, sorted index entries)"""
+    out = bytearray(data)
+    entries = []
+    for i, off in enumerate(range(0, len(out), record_size)):
+        pt = wire.encode_point(factor * wire.decode_point(out[off:off + wire.POINT_SIZE]))
+        out[off:off + wire.POINT_SIZE] = pt
+        entries.append((_fingerprint(pt), first + i))
+    entries.sort()
+    return bytes(out), entries
+
+
+def _run_batches(func, args, batches, workers):
+    if not workers or workers <= 1:
+        for batch in batches:
+            yield func(*args, *batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # keep a bounded number of batches in flight
+        pending = []
+        for batch in batches:
+            pending.append(executor.submit(func, *args, *batch))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for fut in pending:
+            yield fut.result()
+
+
+# --- file helpers ---
+def _map(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_index(path, entries):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        buf = bytearray()
+        for fp, rec in entries:
+            buf += INDEX_ENTRY.pack(fp, rec)
+            if len(buf) >= 1 << 20:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _copy_records(src, dst, record_size, replaced):
+    """copy a records file, swapping in the ciphertexts of replaced {record number: bytes}"""
+    pending = sorted(replaced)
+    i = 0
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        fout.write(fin.read(FILE_HEADER.size))
+        first = 0
+        for data in iter(lambda: fin.read(CHUNK * record_size), b''):
+            block = bytearray(data)
+            last = first + len(block) // record_size
+            while i < len(pending) and pending[i] < last:
+                off = (pending[i] - first) * record_size + wire.POINT_SIZE
+                block[off:off + record_size - wire.POINT_SIZE] = replaced[pending[i]]
+                i += 1
+            fout.write(block)
+            first = last
+        fout.flush()
+        os.fsync(fout.fileno())
+
+
+def _write_keys(path, keys):
+    tmp = os.path.join(path, KEYS + '.tmp')
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(keys, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, KEYS))
+
+
+class BlindedStore:
+    def __init__(self, path):
+        self.path = path
+        self._stamp = None
+        self._records = self._index = b''
+        self.refresh()
+
+    @classmethod
+    def create(cls, path, k2=None):
+        """new empty store with fresh k2 and Paillier keys"""
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, KEYS)):
+            raise FileExistsError(f"store already exists: {path}")
+        pub, priv = paillier.generate_paillier_keypair()
+        k2 = k2 or random.SystemRandom().randrange(2, curve.field.n - 1)
+        with open(os.path.join(path, 'records.0.bin'), 'wb') as f:
+            f.write(FILE_HEADER.pack(MAGIC, STORE_VERSION, wire.ciphertext_width(pub.n)))
+        _write_index(os.path.join(path, 'index.0.bin'), [])
+        _write_keys(path, {"version": STORE_VERSION, "generation": 0, "k2": hex(k2),
+                           "p": hex(priv.p), "q": hex(priv.q)})
+        return cls(path)
+
+    def _file(self, kind, generation):
+        return os.path.join(self.path, f"{kind}.{generation}.bin")
+
+    # --- reading ---
+    def refresh(self):
+        """remap if an append or rotation has been committed since the last call; cheap otherwise"""
+        for _ in range(10):
+            try:
+                keys_stat = os.stat(os.path.join(self.path, KEYS))
+                if self._stamp is not None and self._stamp[0] == (keys_stat.st_ino, keys_stat.st_mtime_ns):
+                    index_stat = os.stat(self._file('index', self.generation))
+                    if self._stamp[1] == (index_stat.st_ino, index_stat.st_size):
+                        return False
+                self._load()
+                return True
+            except FileNotFoundError:
+                time.sleep(0.05)  # a rotation switched generations under us; retry
+        raise RuntimeError(f"store keeps changing: {self.path}")
+
+    def _load(self):
+        keys_path = os.path.join(self.path, KEYS)
+        keys_stat = os.stat(keys_path)
+        with open(keys_path) as f:
+            keys = json.load(f)
+        if keys.get("version") != STORE_VERSION:
+            raise ValueError(f"unsupported store version {keys.get('version')}")
+        generation = keys["generation"]
+        index_path = self._file('index', generation)
+        index_stat = os.stat(index_path)
+        index = _map(index_path)
+        records = _map(self._file('records', generation))
+        magic, version, width = FILE_HEADER.unpack_from(records, 0)
+        if magic != MAGIC or version != STORE_VERSION:
+            raise ValueError("not a blinded store records file")
+
+        p, q = int(keys["p"], 16), int(keys["q"], 16)
+        if self._stamp is None or self.paillier_priv.p != p:
+            self.paillier_pub = paillier.PaillierPublicKey(p * q)
+            self.paillier_priv = paillier.PaillierPrivateKey(self.paillier_pub, p, q)
+        self.generation = generation
+        self.k2 = int(keys["k2"], 16)
+        self.record_size = wire.POINT_SIZE + width
+        self.count = len(index) // INDEX_ENTRY.size
+        self._index, self._records = index, records
+        self._stamp = ((keys_stat.st_ino, keys_stat.st_mtime_ns), (index_stat.st_ino, index_stat.st_size))
+
+    def snapshot(self):
+        """consistent view for one session; stays valid across later appends and rotations"""
+        start = FILE_HEADER.size
+        view = memoryview(self._records)[start:start + self.count * self.record_size]
+        return Snapshot(self.k2, self.paillier_pub, view, self.record_size, self.count)
+
+    def record(self, rec):
+        off = FILE_HEADER.size + rec * self.record_size
+        data = self._records[off:off + self.record_size]
+        return bytes(data[:wire.POINT_SIZE]), int.from_bytes(data[wire.POINT_SIZE:], 'big')
+
+    def lookup(self, point):
+        """record number of a k2-blinded point, or None"""
+        fp = _fingerprint(point)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if INDEX_ENTRY.unpack_from(self._index, mid * INDEX_ENTRY.size)[0] < fp:
+                lo = mid + 1
+            else:
+                hi = mid
+        while lo < self.count:
+            entry_fp, rec = INDEX_ENTRY.unpack_from(self._index, lo * INDEX_ENTRY.size)
+            if entry_fp != fp:
+                break
+            if self.record(rec)[0] == point:
+                return rec
+            lo += 1
+        return None
+
+    def _index_entries(self):
+        return INDEX_ENTRY.iter_unpack(self._index) if self.count else iter(())
+
+    # --- writing ---
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.path, LOCK), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def append(self, leaked_pairs, workers=None):
+        """blind and encrypt only the new (w, t) pairs; a w already in the store gets its count replaced.
+
+        Only new pairs: committed by the index of the current generation. Any replaced count:
+        committed as the next generation, since mapped records must not change.
+        Returns (added, updated).
+        """
+        latest = dict(leaked_pairs)
+        items = list(latest.items())
+        with self._locked():
+            k2, pub, width = self.k2, self.paillier_pub, self.record_size - wire.POINT_SIZE
+            batches = [(items[i:i + CHUNK],) for i in range(0, len(items), CHUNK)]
+            new_entries = []
+            replaced = {}
+            end = FILE_HEADER.size + self.count * self.record_size
+            records_path = self._file('records', self.generation)
+            with open(records_path, 'r+b') as f:
+                f.truncate(end)  # drop leftovers of an interrupted append
+                f.seek(end)
+                for blinded in _run_batches(_blind_chunk, (k2, pub), batches, workers):
+                    out = bytearray()
+                    for pt, c in blinded:
+                        rec = self.lookup(pt)
+                        if rec is not None:
+                            replaced[rec] = c.to_bytes(width, 'big')
+                            continue
+                        new_entries.append((_fingerprint(pt), self.count + len(new_entries)))
+                        out += pt
+                        out += c.to_bytes(width, 'big')
+                    f.write(out)
+                f.flush()
+                os.fsync(f.fileno())
+            new_entries.sort()
+            entries = heapq.merge(self._index_entries(), new_entries)
+            if not replaced:
+                _write_index(self._file('index', self.generation), entries)  # commit point
+                self.refresh()
+            else:
+                generation = self.generation + 1
+                _copy_records(records_path, self._file('records', generation), self.record_size, replaced)
+                _write_index(self._file('index', generation), entries)
+                self._switch(generation)
+        return len(new_entries), len(replaced)
+
+    def rotate(self, new_k2=None, workers=None):
+        """re-blind every record from k2 to new_k2 without touching the identifiers or counts"""
+        with self._locked():
+            order = curve.field.n
+            new_k2 = new_k2 or random.SystemRandom().randrange(2, order - 1)
+            factor = new_k2 * pow(self.k2, -1, order) % order
+            generation = self.generation + 1
+            snap = self.snapshot()
+            step = CHUNK * snap.record_size
+            batches = ((bytes(snap.records[off:off + step]), off // snap.record_size)
+                       for off in range(0, len(snap.records), step))
+            runs = []
+            records_path = self._file('records', generation)
+            with open(records_path, 'wb') as f:
+                f.write(self._records[:FILE_HEADER.size])
+                for data, entries in _run_batches(_reblind_chunk, (factor, snap.record_size), batches, workers):
+                    f.write(data)
+                    runs.append(entries)
+                f.flush()
+                os.fsync(f.fileno())
+            _write_index(self._file('index', generation), heapq.merge(*runs))
+            del runs, snap
+            self._switch(generation, k2=hex(new_k2))
+
+    def _switch(self, generation, **changes):
+        """commit a fully written generation by replacing keys.json, then drop the old files"""
+        with open(os.path.join(self.path, KEYS)) as f:
+            keys = json.load(f)
+        keys.update(generation=generation, **changes)
+        _write_keys(self.path, keys)  # commit point
+        old = self.generation
+        self.refresh()
+        for kind in ('records', 'index'):
+            os.remove(self._file(kind, old))  # sessions that mapped them keep their view
+
+
+def _read_pairs(path):
+    """lines "identifier count"; the identifier is everything before the last space"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                w, t = line.rsplit(None, 1)
+                yield w, int(t)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="k2-blinded leaked-set store")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init").add_argument("store")
+    add = sub.add_parser("add", help="append leaked credentials (lines 'identifier count')")
+    add.add_argument("store")
+    add.add_argument("file")
+    add.add_argument("--batch", type=int, default=100000)
+    rot = sub.add_parser("rotate", help="re-blind the store under a fresh k2")
+    rot.add_argument("store")
+    sub.add_parser("info").add_argument("store")
+    for p in (add, rot):
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "init":
+        BlindedStore.create(args.store)
+        print(f"Created store {args.store}")
+        return 0
+    store = BlindedStore(args.store)
+    t1 = time.time()
+    if args.cmd == "add":
+        batch, added, updated = [], 0, 0
+        for pair in _read_pairs(args.file):
+            batch.append(pair)
+            if len(batch) >= args.batch:
+                a, u = store.append(batch, args.workers)
+                added, updated, batch = added + a, updated + u, []
+        if batch:
+            a, u = store.append(batch, args.workers)
+            added, updated = added + a, updated + u
+        print(f"Added {added}, updated {updated} in {time.time() - t1:.2f} s; {store.count} records.")
+    elif args.cmd == "rotate":
+        store.rotate(workers=args.workers)
+        print(f"Rotated k2 over {store.count} records in {time.time() - t1:.2f} s; generation {store.generation}.")
+    else:
+        print(f"{args.store}: generation {store.generation}, {store.count} records of {store.record_size} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 # client.py
 import socket
+import sys
 import json
 from tinyec import registry
 import hashlib
@@ -7,6 +8,9 @@ import random
 from phe import paillier
 from tinyec.ec import Point
 
+import packing
+import wire
+
 HOST = '127.0.0.1'
 PORT = 54545
 
@@ -49,7 +53,9 @@ def recv_json(conn):
     return json.loads(data)
 
 # --- client protocol ---
-def run_client(user_ids):
+def run_client(user_ids, wire_format="binary", packed=True):
+    # wire_format: "binary" (compact framing) or "json" (readable, for debugging)
+    # packed: ask for several leak counts per ciphertext (the server may decline)
     print("Client (P1) starting...")
     k1 = random.SystemRandom().randrange(2, curve.field.p - 1)
     print("P1 k1 chosen.")
@@ -60,49 +66,58 @@ def run_client(user_ids):
         s = hash_to_scalar(vid)
         pt = s * curve.g
         pt_k1 = k1 * pt
-        p1_pts.append(point_to_hex(pt_k1))
+        p1_pts.append(pt_k1)
     random.SystemRandom().shuffle(p1_pts)
 
     with socket.socket() as s:
         s.connect((HOST, PORT))
+        # Negotiate the wire format
+        send_json(s, {"type": "HELLO", "formats": [wire_format], "version": wire.VERSION, "packing": packed})
+        hello = recv_json(s)
+        fmt = hello.get('format', 'json')
+        packed = bool(hello.get('packing'))
+        print(f"Server selected {fmt} wire format{' with packed counts' if packed else ''}.")
+
         # Send ROUND1
-        send_json(s, {"type": "ROUND1", "points": p1_pts})
+        if fmt == "binary":
+            wire.send_frame(s, wire.ROUND1, wire.encode_round1(p1_pts))
+        else:
+            send_json(s, {"type": "ROUND1", "points": [point_to_hex(pt) for pt in p1_pts]})
         print("Sent ROUND1 to server.")
 
-        # Receive ROUND2
-        msg = recv_json(s)
-        if msg.get('type') != 'ROUND2':
-            print("Protocol error: expecting ROUND2")
+        if packed:
+            run_packed_rounds(s, fmt, k1)
             return
-        Z_hex = msg['Z']
-        enc_pairs = msg['enc_pairs']
-        paillier_n = int(msg['paillier_n'])
-        print(f"Received ROUND2: |Z|={len(Z_hex)} enc_pairs={len(enc_pairs)}")
+
+        # Receive ROUND2. Points of Z are compared by their compressed encoding,
+        # which identifies a point uniquely.
+        if fmt == "binary":
+            _, body = wire.recv_frame(s, wire.ROUND2)
+            Z_keys, pairs, paillier_n = wire.decode_round2(body)
+            enc_pairs = [(wire.decode_point(pt), c, 0) for pt, c in pairs]
+        else:
+            msg = recv_json(s)
+            if msg.get('type') != 'ROUND2':
+                print("Protocol error: expecting ROUND2")
+                return
+            Z_keys = [wire.encode_point(hex_to_point(z_h)) for z_h in msg['Z']]
+            enc_pairs = [(hex_to_point(pt_hex), int(enc_dict['c']), int(enc_dict.get('exponent', 0)))
+                         for pt_hex, enc_dict in msg['enc_pairs']]
+            paillier_n = int(msg['paillier_n'])
+        print(f"Received ROUND2: |Z|={len(Z_keys)} enc_pairs={len(enc_pairs)}")
 
         # Reconstruct Paillier public key and encrypted numbers
         paillier_pub = paillier.PaillierPublicKey(paillier_n)
-
-        # Convert Z to point set (bytes->point)
-        Z_pts = set()
-        for z_h in Z_hex:
-            pt = hex_to_point(z_h)
-            # Use tuple (x,y) as set key
-            Z_pts.add( (pt.x, pt.y) )
+        Z_pts = set(Z_keys)
 
         # For each enc_pair, compute k1*(H(w)^k2) and test membership in Z
         matched_enc = []
-        for (pt_hex, enc_dict) in enc_pairs:
-            pt_k2 = hex_to_point(pt_hex)
+        for pt_k2, c, exponent in enc_pairs:
             # compute k1 * pt_k2 -> pt_k1k2
             pt_k1k2 = k1 * pt_k2
-            key = (pt_k1k2.x, pt_k1k2.y)
-            if key in Z_pts:
+            if wire.encode_point(pt_k1k2) in Z_pts:
                 # it's in intersection -> include enc
-                # Rebuild EncryptedNumber: need ciphertext integer and exponent
-                c = int(enc_dict['c'])
-                exponent = int(enc_dict.get('exponent', 0))
-                encnum = paillier.EncryptedNumber(paillier_pub, c, exponent)
-                matched_enc.append(encnum)
+                matched_enc.append(paillier.EncryptedNumber(paillier_pub, c, exponent))
 
         # homomorphically sum matched_enc
         if not matched_enc:
@@ -114,10 +129,52 @@ def run_client(user_ids):
             enc_sum = acc
 
         # Send ROUND3: encrypted sum (as c and exponent)
-        send_json(s, {"type": "ROUND3", "enc_sum": {"c": enc_sum.ciphertext(), "exponent": enc_sum.exponent}})
+        if fmt == "binary":
+            wire.send_frame(s, wire.ROUND3, wire.encode_round3(enc_sum.ciphertext(), paillier_n))
+        else:
+            send_json(s, {"type": "ROUND3", "enc_sum": {"c": enc_sum.ciphertext(), "exponent": enc_sum.exponent}})
         print("Sent ROUND3 (encrypted sum) to server.")
         # Done
 
+def run_packed_rounds(s, fmt, k1):
+    # ROUND2: leaked point i has its count in slot i % slots of ciphertext i // slots
+    if fmt == "binary":
+        _, body = wire.recv_frame(s, wire.ROUND2P)
+        Z_keys, points, ciphertexts, paillier_n, slots, width = wire.decode_round2_packed(body)
+        points = [wire.decode_point(pt) for pt in points]
+    else:
+        msg = recv_json(s)
+        if msg.get('type') != 'ROUND2' or 'packing' not in msg:
+            print("Protocol error: expecting packed ROUND2")
+            return
+        Z_keys = [wire.encode_point(hex_to_point(z_h)) for z_h in msg['Z']]
+        points = [hex_to_point(pt_hex) for pt_hex in msg['points']]
+        ciphertexts = [int(c) for c in msg['ciphertexts']]
+        paillier_n = int(msg['paillier_n'])
+        slots, width = int(msg['packing']['slots']), int(msg['packing']['width'])
+    print(f"Received packed ROUND2: |Z|={len(Z_keys)} points={len(points)} "
+          f"ciphertexts={len(ciphertexts)} slots={slots}")
+
+    # For each slot position j, multiply the ciphertexts whose slot j matched (homomorphic sum)
+    paillier_pub = paillier.PaillierPublicKey(paillier_n)
+    nsquare = paillier_pub.nsquare
+    Z_pts = set(Z_keys)
+    sums = [1] * slots
+    for i, pt_k2 in enumerate(points):
+        if wire.encode_point(k1 * pt_k2) in Z_pts:
+            sums[i % slots] = sums[i % slots] * ciphertexts[i // slots] % nsquare
+
+    # Mask the other slots and add the zero-sum offsets, with fresh randomness (see packing.py)
+    enc_sums = [c * paillier_pub.raw_encrypt(m) % nsquare
+                for c, m in zip(sums, packing.slot_masks(slots, width))]
+
+    # ROUND3: one ciphertext per slot position
+    if fmt == "binary":
+        wire.send_frame(s, wire.ROUND3P, wire.encode_round3_packed(enc_sums, paillier_n))
+    else:
+        send_json(s, {"type": "ROUND3", "enc_sums": enc_sums})
+    print("Sent ROUND3 (encrypted slot sums) to server.")
+
 if __name__ == "__main__":
     # demo user ids
     user_ids = [
@@ -126,4 +183,4 @@ if __name__ == "__main__":
         "pw:letmein",
         "pw:unique_pass_42"
     ]
-    run_client(user_ids)
+    run_client(user_ids, "json" if "--json" in sys.argv else "binary", "--unpacked" not in sys.argv)
@@ -0,0 +1,59 @@
+# packing.py
+# Several leak counts per Paillier plaintext ("packed" mode of the Password Checkup rounds).
+#
+# Counts go in `slots` disjoint slots of `width` bits: plaintext = sum_k t_k * 2^(k*width).
+# Leaked entry i sits in slot i % slots of ciphertext i // slots. For every slot position j
+# the client multiplies the ciphertexts whose slot j matched, so slot j of B_j holds the
+# partial sum s_j. Before sending B_j it adds, with fresh randomness,
+#   - a statistical mask below 2^(width-1) in every other slot, hiding the counts there, and
+#   - an offset z_j in slot j, with sum(z_j) = 0 mod 2^width, so the server learns only
+#     SJ = sum(s_j) mod 2^width and not how the matches are spread over slot positions.
+# A slot is stat_bits + 1 bits wider (STAT_BITS by default) than the largest possible sum, so sum + mask never
+# carries into the next slot; the carry of an offset only lands in a masked slot.
+import secrets
+
+STAT_BITS = 40
+
+
+def packing_params(n, max_count, entries, stat_bits=STAT_BITS):
+    """(slots, width) for a leaked set of `entries` counts no larger than max_count"""
+    width = (max(1, max_count) * max(1, entries)).bit_length() + stat_bits + 1
+    # the offset carry can reach one bit above the top slot; keep the plaintext below n
+    slots = min((n.bit_length() - 3) // width, max(1, entries))
+    if slots < 1:
+        raise ValueError("Paillier modulus too small for a single slot")
+    return slots, width
+
+
+def pack_counts(counts, slots, width, stat_bits=STAT_BITS):
+    """plaintexts holding `slots` consecutive counts each; stat_bits as given to packing_params"""
+    limit = 1 << (width - stat_bits - 1)
+    plaintexts = []
+    for i in range(0, len(counts), slots):
+        value = 0
+        for k, t in enumerate(counts[i:i + slots]):
+            if not 0 <= t < limit:
+                raise ValueError("count does not fit its slot")
+            value |= t << (k * width)
+        plaintexts.append(value)
+    return plaintexts
+
+
+def slot_masks(slots, width):
+    """client side: plaintext M_j to add to the partial sum B_j of every slot position j"""
+    top = 1 << width
+    offsets = [secrets.randbelow(top) for _ in range(slots - 1)]
+    offsets.append(-sum(offsets) % top)
+    masks = []
+    for j in range(slots):
+        m = 0
+        for k in range(slots):
+            m |= (offsets[j] if k == j else secrets.randbelow(top >> 1)) << (k * width)
+        masks.append(m)
+    return masks
+
+
+def unpack_sum(plaintexts, width):
+    """server side: SJ from the decrypted B_j, reading slot j of the j-th plaintext"""
+    top = 1 << width
+    return sum((p >> (j * width)) & (top - 1) for j, p in enumerate(plaintexts)) % top
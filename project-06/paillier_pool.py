@@ -0,0 +1,229 @@
+# paillier_pool.py
+# Precomputed Paillier obfuscators for the server's count encryption.
+#
+# A Paillier ciphertext is c = (1 + m*n) * r^n mod n^2. The r^n factor (the obfuscator) does
+# not depend on m and costs a full exponentiation, so it is computed ahead of time by a
+# background thread feeding batches to low-priority worker processes. Encrypting a count or
+# re-randomizing a stored ciphertext then costs one modular multiplication.
+#
+# Every obfuscator is handed out once. On close() the unused ones are written to disk, and
+# the next start reads the file and unlinks it before using any of them, so a crash can lose
+# obfuscators but never hand one out twice.
+import hashlib
+import os
+import secrets
+import struct
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from phe import paillier
+
+POOL_MAGIC = b'PCOP'
+POOL_HEADER = struct.Struct('>4sH16s')  # magic | obfuscator width | fingerprint of n
+NUDE_CACHE_SIZE = 4096
+WORKER_NICE = 10  # fill workers yield the CPU to session work
+
+
+def key_fingerprint(n):
+    return hashlib.sha256(n.to_bytes((n.bit_length() + 7) // 8, 'big')).digest()[:16]
+
+
+def make_obfuscators(n, count):
+    """count fresh r^n mod n^2 values (module level so it can run in worker processes)"""
+    nsquare = n * n
+    result = []
+    while len(result) < count:
+        r = secrets.randbelow(n)
+        if r > 1:
+            result.append(pow(r, n, nsquare))
+    return result
+
+
+def _lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICE)
+
+
+def apply_obfuscators(nsquare, values, obfuscators):
+    """values are nude ciphertexts (1 + m*n) or existing ciphertexts; one multiplication each"""
+    return [v * r % nsquare for v, r in zip(values, obfuscators)]
+
+
+# after fork the child must drop inherited obfuscators, or parent and child would share them
+_pools = weakref.WeakSet()
+
+
+def _reset_pools_after_fork():
+    for pool in list(_pools):
+        pool._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+class ObfuscatorPool:
+    """Pool of r^n mod n^2 values for one Paillier public key, refilled in the background.
+
+    When the depth drops below low_watermark the fill thread computes batches until it
+    reaches high_watermark, in `workers` niced processes (in the thread itself if workers=0).
+    take_many() never blocks on computation: it returns what is available and counts the
+    shortfall as a starvation, so callers can compute the rest off the event loop.
+    """
+
+    def __init__(self, pub, low_watermark=1024, high_watermark=8192, batch_size=16,
+                 workers=1, path=None):
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("require 0 <= low_watermark < high_watermark")
+        self.pub = pub
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.batch_size = batch_size
+        self.executor = None
+        if workers:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority)
+        self.path = path
+        self.width = 2 * ((pub.n.bit_length() + 7) // 8)
+        self._items = deque()
+        self._nude = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._pid = os.getpid()
+        self._thread = None
+        self.produced = 0
+        self.consumed = 0
+        self.loaded = 0
+        self.starvations = 0
+        _pools.add(self)
+        if path:
+            self._load()
+        self._start()
+
+    # --- persistence ---
+    def _load(self):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            os.unlink(self.path)  # unlink before use: these obfuscators are now ours alone
+            data = f.read()
+        if len(data) < POOL_HEADER.size:
+            return
+        magic, width, fp = POOL_HEADER.unpack_from(data, 0)
+        if magic != POOL_MAGIC or width != self.width or fp != key_fingerprint(self.pub.n):
+            return  # written for another key; discard
+        items = [int.from_bytes(data[off:off + width], 'big')
+                 for off in range(POOL_HEADER.size, len(data) - width + 1, width)]
+        self._items.extend(items)
+        self.loaded = len(items)
+
+    def _save(self, items):
+        tmp = self.path + '.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(POOL_HEADER.pack(POOL_MAGIC, self.width, key_fingerprint(self.pub.n)))
+            for r in items:
+                f.write(r.to_bytes(self.width, 'big'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    # --- background fill ---
+    def _start(self):
+        self._thread = threading.Thread(target=self._fill_loop, name="paillier-pool", daemon=True)
+        self._thread.start()
+
+    def _fill_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._items) >= self.low_watermark:
+                    self._cond.wait()
+                if self._closed or self._pid != os.getpid():
+                    return
+                need = self.high_watermark - len(self._items)
+            while need > 0 and not self._closed:
+                size = min(self.batch_size, need)
+                try:
+                    if self.executor is not None:
+                        batch = self.executor.submit(make_obfuscators, self.pub.n, size).result()
+                    else:
+                        batch = make_obfuscators(self.pub.n, size)
+                except (RuntimeError, CancelledError):
+                    return  # pool closed
+                with self._cond:
+                    if self._pid != os.getpid() or self._closed:
+                        return
+                    self._items.extend(batch)
+                    self.produced += size
+                need -= size
+
+    def _after_fork(self):
+        # child: drop inherited obfuscators; the fill thread is restarted lazily by take_many(),
+        # so forked executor workers that never encrypt do not start filling
+        self._cond = threading.Condition()
+        self._items = deque()
+        self._pid = os.getpid()
+        self._thread = None
+        self.path = None  # only the parent persists the pool
+        self.executor = None
+
+    # --- consumers ---
+    def take_many(self, count):
+        """up to count never-used obfuscators; fewer if the pool runs dry"""
+        if self._pid != os.getpid():
+            self._after_fork()
+        if self._thread is None and not self._closed:
+            self._start()
+        with self._cond:
+            take = min(count, len(self._items))
+            items = [self._items.popleft() for _ in range(take)]
+            self.consumed += take
+            if take < count:
+                self.starvations += 1
+            if len(self._items) < self.low_watermark:
+                self._cond.notify()
+        return items
+
+    def take(self):
+        items = self.take_many(1)
+        return items[0] if items else make_obfuscators(self.pub.n, 1)[0]
+
+    def nude(self, m):
+        """(1 + m*n) mod n^2, cached for the small set of distinct counts"""
+        c = self._nude.get(m)
+        if c is None:
+            c = self.pub.raw_encrypt(m, r_value=1)
+            if len(self._nude) < NUDE_CACHE_SIZE:
+                self._nude[m] = c
+        return c
+
+    def encrypt(self, m):
+        return paillier.EncryptedNumber(self.pub, self.nude(m) * self.take() % self.pub.nsquare, 0)
+
+    def rerandomize(self, c):
+        return c * self.take() % self.pub.nsquare
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "produced": self.produced,
+                "consumed": self.consumed,
+                "loaded": self.loaded,
+                "starvations": self.starvations,
+            }
+
+    def close(self, save=True):
+        """stop the fill thread; unused obfuscators go to path (if any) and leave memory"""
+        with self._cond:
+            self._closed = True
+            items = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if save and self.path and items and self._pid == os.getpid():
+            self._save(items)
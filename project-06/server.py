@@ -7,6 +7,9 @@ import random
 from phe import paillier
 from tinyec.ec import Point
 
+import packing
+import wire
+
 HOST = '127.0.0.1'
 PORT = 54545
 
@@ -72,19 +75,40 @@ def run_server(leaked_pairs):
         conn, addr = s.accept()
         with conn:
             print("Connected by", addr)
-            # --- Receive ROUND1 from P1: list of points (each as hex dict) ---
+            # --- Optional HELLO: negotiate the wire format (legacy clients start with a JSON ROUND1) ---
             msg = recv_json(conn)
-            if msg.get('type') != 'ROUND1':
-                print("Protocol error: expecting ROUND1")
+            fmt = "json"
+            packed = False
+            if msg.get('type') == 'HELLO':
+                fmt = wire.choose_format(msg.get('formats', []))
+                packed = bool(msg.get('packing')) and bool(leaked_pairs)
+                send_json(conn, {"type": "HELLO", "format": fmt, "version": wire.VERSION, "packing": packed})
+                print(f"Negotiated {fmt} wire format{' with packed counts' if packed else ''}.")
+                msg = None
+
+            # --- Receive ROUND1 from P1: list of points ---
+            try:
+                if fmt == "binary":
+                    _, body = wire.recv_frame(conn, wire.ROUND1)
+                    p1_points = [wire.decode_point(p) for p in wire.decode_round1(body)]
+                else:
+                    if msg is None:
+                        msg = recv_json(conn)
+                    if msg.get('type') != 'ROUND1':
+                        print("Protocol error: expecting ROUND1")
+                        return
+                    p1_points_hex = msg['points']  # list of hex dicts
+                    p1_points = [hex_to_point(d) for d in p1_points_hex]
+                    if any(pt is None for pt in p1_points):
+                        raise ValueError("point at infinity")
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                print("Protocol error: invalid ROUND1:", e)
                 return
-            p1_points_hex = msg['points']  # list of hex dicts
-            p1_points = [hex_to_point(d) for d in p1_points_hex]
             print(f"Received ROUND1 with {len(p1_points)} points from P1.")
 
             # --- Round2 preparation ---
             # Compute Z = { k2 * (points received) } -> send back to P1
             Z_pts = [k2 * pt for pt in p1_points]  # tinyec supports scalar*Point
-            Z_hex = [point_to_hex(pt) for pt in Z_pts]
 
             # For each leaked pair, compute H(w)^k2 and Paillier-encrypt t_j
             enc_pairs = []
@@ -92,30 +116,78 @@ def run_server(leaked_pairs):
                 s_w = hash_to_scalar(wj)
                 # point s_w * G, then multiply by k2 => k2 * (s_w * G) = (k2*s_w)*G
                 pt_w_k2 = (k2 * (s_w * curve.g))
-                enc_tj = paillier_pub.encrypt(tj)
-                enc_pairs.append( (point_to_hex(pt_w_k2), {"c": enc_tj.ciphertext(), "exponent": enc_tj.exponent}) )
+                if packed:
+                    enc_pairs.append((pt_w_k2, tj))  # encrypted below, several counts per ciphertext
+                else:
+                    enc_tj = paillier_pub.encrypt(tj)
+                    enc_pairs.append((pt_w_k2, enc_tj))
 
             # Shuffle both sets (to hide ordering)
-            random.SystemRandom().shuffle(Z_hex)
+            random.SystemRandom().shuffle(Z_pts)
             random.SystemRandom().shuffle(enc_pairs)
 
             # Send ROUND2: Z and enc_pairs and public key n
-            payload = {
-                "type": "ROUND2",
-                "Z": Z_hex,
-                "enc_pairs": enc_pairs,
-                "paillier_n": paillier_pub.n
-            }
-            send_json(conn, payload)
+            if packed:
+                # counts of `slots` consecutive pairs share one ciphertext (see packing.py)
+                slots, width = packing.packing_params(paillier_pub.n, max(t for _, t in enc_pairs), len(enc_pairs))
+                counts = [t for _, t in enc_pairs]
+                ciphertexts = [paillier_pub.raw_encrypt(p) for p in packing.pack_counts(counts, slots, width)]
+                if fmt == "binary":
+                    body = wire.encode_round2_packed(Z_pts, [pt for pt, _ in enc_pairs], ciphertexts,
+                                                     paillier_pub.n, slots, width)
+                    wire.send_frame(conn, wire.ROUND2P, body)
+                else:
+                    send_json(conn, {
+                        "type": "ROUND2",
+                        "packing": {"slots": slots, "width": width},
+                        "Z": [point_to_hex(pt) for pt in Z_pts],
+                        "points": [point_to_hex(pt) for pt, _ in enc_pairs],
+                        "ciphertexts": ciphertexts,
+                        "paillier_n": paillier_pub.n
+                    })
+            elif fmt == "binary":
+                # binary mode carries integer counts only (exponent 0)
+                body = wire.encode_round2(Z_pts, [(pt, enc.ciphertext()) for pt, enc in enc_pairs], paillier_pub.n)
+                wire.send_frame(conn, wire.ROUND2, body)
+            else:
+                payload = {
+                    "type": "ROUND2",
+                    "Z": [point_to_hex(pt) for pt in Z_pts],
+                    "enc_pairs": [(point_to_hex(pt), {"c": enc.ciphertext(), "exponent": enc.exponent})
+                                  for pt, enc in enc_pairs],
+                    "paillier_n": paillier_pub.n
+                }
+                send_json(conn, payload)
             print("Sent ROUND2 to P1.")
 
             # --- Receive ROUND3: encrypted sum from P1 ---
-            msg3 = recv_json(conn)
-            if msg3.get('type') != 'ROUND3':
-                print("Protocol error: expecting ROUND3")
+            if packed:
+                # one encrypted partial sum per slot position; SJ is read from slot j of the j-th
+                if fmt == "binary":
+                    _, body = wire.recv_frame(conn, wire.ROUND3P)
+                    enc_sums = wire.decode_round3_packed(body)
+                else:
+                    msg3 = recv_json(conn)
+                    if msg3.get('type') != 'ROUND3':
+                        print("Protocol error: expecting ROUND3")
+                        return
+                    enc_sums = [int(c) for c in msg3['enc_sums']]
+                if len(enc_sums) != slots:
+                    print("Protocol error: expecting one sum per slot")
+                    return
+                SJ = packing.unpack_sum([paillier_priv.raw_decrypt(c) for c in enc_sums], width)
+                print("Server decrypted intersection-sum SJ =", SJ)
                 return
-            encsum_dict = msg3['enc_sum']  # {c, exponent}
-            encsum = paillier.EncryptedNumber(paillier_pub, int(encsum_dict['c']), int(encsum_dict.get('exponent', 0)))
+            if fmt == "binary":
+                _, body = wire.recv_frame(conn, wire.ROUND3)
+                encsum = paillier.EncryptedNumber(paillier_pub, wire.decode_round3(body), 0)
+            else:
+                msg3 = recv_json(conn)
+                if msg3.get('type') != 'ROUND3':
+                    print("Protocol error: expecting ROUND3")
+                    return
+                encsum_dict = msg3['enc_sum']  # {c, exponent}
+                encsum = paillier.EncryptedNumber(paillier_pub, int(encsum_dict['c']), int(encsum_dict.get('exponent', 0)))
             SJ = paillier_priv.decrypt(encsum)
             print("Server decrypted intersection-sum SJ =", SJ)
             # done
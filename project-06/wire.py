@@ -0,0 +1,299 @@
+# wire.py
+# Compact binary framing for the Password Checkup rounds.
+#
+# Every binary frame is   version (1 byte) | type (1 byte) | payload length (4 bytes, big-endian) | payload
+# Points are 33-byte SEC1 compressed encodings and Paillier ciphertexts are fixed-width
+# big-endian integers of 2*|n| bytes. The format is negotiated with a JSON HELLO message,
+# so the JSON mode of server.py / client.py stays available for debugging.
+import struct
+from tinyec import registry
+from tinyec.ec import Point
+
+VERSION = 1
+
+HELLO, ROUND1, ROUND2, ROUND3, ROUND2P, ROUND3P = 0, 1, 2, 3, 4, 5
+TYPE_NAMES = {HELLO: "HELLO", ROUND1: "ROUND1", ROUND2: "ROUND2", ROUND3: "ROUND3",
+              ROUND2P: "ROUND2P", ROUND3P: "ROUND3P"}
+
+FORMATS = ("binary", "json")
+
+HEADER = struct.Struct('>BBI')
+COUNT = struct.Struct('>I')
+WIDTH = struct.Struct('>H')
+POINT_SIZE = 33
+MAX_FRAME = 1 << 20      # limit for frame types without a limit of their own
+MAX_POINTS = 1 << 20     # largest ROUND1
+MAX_ROUND2 = 1 << 30     # server -> client; the client chose the server it talks to
+MAX_CIPHERTEXT = 4096    # bytes; Paillier moduli up to 16384 bits
+MAX_SLOTS = 1024
+
+curve = registry.get_curve('secp256r1')
+_P = curve.field.p
+_SQRT_EXP = (_P + 1) // 4  # P-256 has p = 3 (mod 4)
+_INF = bytes(POINT_SIZE)
+
+
+# --- points ---
+def encode_point(pt):
+    if isinstance(pt, (bytes, bytearray)):
+        return bytes(pt)  # already encoded
+    if pt is None or getattr(pt, 'x', None) is None:
+        return _INF
+    return bytes([2 | (pt.y & 1)]) + pt.x.to_bytes(32, 'big')
+
+
+def decode_point(data):
+    data = bytes(data)
+    if data == _INF:
+        raise ValueError("point at infinity")
+    if len(data) != POINT_SIZE or data[0] not in (2, 3):
+        raise ValueError("invalid compressed point")
+    x = int.from_bytes(data[1:], 'big')
+    if x >= _P:
+        raise ValueError("point is not on the curve")
+    y2 = (x * x * x + curve.a * x + curve.b) % _P
+    y = pow(y2, _SQRT_EXP, _P)
+    if y * y % _P != y2:
+        raise ValueError("point is not on the curve")
+    if (y & 1) != (data[0] & 1):
+        y = _P - y
+    return Point(curve, x, y)
+
+
+def _pack_points(encoded, out, offset):
+    for p in encoded:
+        out[offset:offset + POINT_SIZE] = p
+        offset += POINT_SIZE
+    return offset
+
+
+def _split_points(view, offset, count):
+    end = offset + count * POINT_SIZE
+    if end > len(view):
+        raise ValueError("truncated frame")
+    return [bytes(view[i:i + POINT_SIZE]) for i in range(offset, end, POINT_SIZE)], end
+
+
+def ciphertext_width(n):
+    # c < n^2, so 2*|n| bytes always suffice
+    return 2 * ((n.bit_length() + 7) // 8)
+
+
+# --- message bodies ---
+# Decoders return points as raw 33-byte encodings; callers decompress only what they
+# need (the client can test membership on encodings directly).
+def encode_round1(points):
+    out = bytearray(COUNT.size + len(points) * POINT_SIZE)
+    COUNT.pack_into(out, 0, len(points))
+    _pack_points([encode_point(p) for p in points], out, COUNT.size)
+    return out
+
+
+def decode_round1(view):
+    (count,) = COUNT.unpack_from(view, 0)
+    points, _ = _split_points(view, COUNT.size, count)
+    return points
+
+
+def encode_round2(Z, enc_pairs, n):
+    """Z: points; enc_pairs: [(point, ciphertext int)]; n: Paillier modulus"""
+    n_bytes = (n.bit_length() + 7) // 8
+    width = ciphertext_width(n)
+    size = WIDTH.size + n_bytes + 2 * COUNT.size + len(Z) * POINT_SIZE + len(enc_pairs) * (POINT_SIZE + width)
+    out = bytearray(size)
+    WIDTH.pack_into(out, 0, n_bytes)
+    off = WIDTH.size
+    out[off:off + n_bytes] = n.to_bytes(n_bytes, 'big')
+    off += n_bytes
+    COUNT.pack_into(out, off, len(Z))
+    off = _pack_points([encode_point(p) for p in Z], out, off + COUNT.size)
+    COUNT.pack_into(out, off, len(enc_pairs))
+    off += COUNT.size
+    for pt, c in enc_pairs:
+        out[off:off + POINT_SIZE] = encode_point(pt)
+        off += POINT_SIZE
+        out[off:off + width] = c.to_bytes(width, 'big')
+        off += width
+    return out
+
+
+def decode_round2(view):
+    """returns (Z encodings, [(point encoding, ciphertext int)], n)"""
+    (n_bytes,) = WIDTH.unpack_from(view, 0)
+    off = WIDTH.size
+    n = int.from_bytes(view[off:off + n_bytes], 'big')
+    off += n_bytes
+    width = ciphertext_width(n)
+    (z_count,) = COUNT.unpack_from(view, off)
+    Z, off = _split_points(view, off + COUNT.size, z_count)
+    (pair_count,) = COUNT.unpack_from(view, off)
+    off += COUNT.size
+    if off + pair_count * (POINT_SIZE + width) > len(view):
+        raise ValueError("truncated frame")
+    pairs = []
+    for _ in range(pair_count):
+        pt = bytes(view[off:off + POINT_SIZE])
+        off += POINT_SIZE
+        pairs.append((pt, int.from_bytes(view[off:off + width], 'big')))
+        off += width
+    return Z, pairs, n
+
+
+# packed mode (see packing.py): leaked point i belongs to slot i % slots of ciphertext i // slots
+def _pack_ciphertexts(cs, width, out, offset):
+    COUNT.pack_into(out, offset, len(cs))
+    offset += COUNT.size
+    for c in cs:
+        out[offset:offset + width] = c.to_bytes(width, 'big')
+        offset += width
+    return offset
+
+
+def _split_ciphertexts(view, offset, width, max_count=None):
+    (count,) = COUNT.unpack_from(view, offset)
+    offset += COUNT.size
+    if not count:
+        return [], offset
+    if not 0 < width <= MAX_CIPHERTEXT:
+        raise ValueError(f"protocol error: invalid ciphertext width {width}")
+    if max_count is not None and count > max_count:
+        raise ValueError(f"protocol error: {count} ciphertexts, at most {max_count} allowed")
+    if offset + count * width > len(view):
+        raise ValueError("truncated frame")
+    return [int.from_bytes(view[off:off + width], 'big')
+            for off in range(offset, offset + count * width, width)], offset + count * width
+
+
+def encode_round2_packed(Z, points, ciphertexts, n, slots, width):
+    n_bytes = (n.bit_length() + 7) // 8
+    c_width = ciphertext_width(n)
+    size = (WIDTH.size + n_bytes + 2 * WIDTH.size + 3 * COUNT.size
+            + (len(Z) + len(points)) * POINT_SIZE + len(ciphertexts) * c_width)
+    out = bytearray(size)
+    WIDTH.pack_into(out, 0, n_bytes)
+    off = WIDTH.size
+    out[off:off + n_bytes] = n.to_bytes(n_bytes, 'big')
+    off += n_bytes
+    WIDTH.pack_into(out, off, slots)
+    WIDTH.pack_into(out, off + WIDTH.size, width)
+    off += 2 * WIDTH.size
+    COUNT.pack_into(out, off, len(Z))
+    off = _pack_points([encode_point(p) for p in Z], out, off + COUNT.size)
+    COUNT.pack_into(out, off, len(points))
+    off = _pack_points([encode_point(p) for p in points], out, off + COUNT.size)
+    _pack_ciphertexts(ciphertexts, c_width, out, off)
+    return out
+
+
+def decode_round2_packed(view):
+    """returns (Z encodings, point encodings, ciphertext ints, n, slots, width)"""
+    (n_bytes,) = WIDTH.unpack_from(view, 0)
+    off = WIDTH.size
+    n = int.from_bytes(view[off:off + n_bytes], 'big')
+    off += n_bytes
+    slots, width = WIDTH.unpack_from(view, off)[0], WIDTH.unpack_from(view, off + WIDTH.size)[0]
+    off += 2 * WIDTH.size
+    (z_count,) = COUNT.unpack_from(view, off)
+    Z, off = _split_points(view, off + COUNT.size, z_count)
+    (p_count,) = COUNT.unpack_from(view, off)
+    points, off = _split_points(view, off + COUNT.size, p_count)
+    ciphertexts, _ = _split_ciphertexts(view, off, ciphertext_width(n))
+    if slots < 1 or len(ciphertexts) != -(-len(points) // slots):
+        raise ValueError("inconsistent packing")
+    return Z, points, ciphertexts, n, slots, width
+
+
+def encode_round3_packed(cs, n):
+    width = ciphertext_width(n)
+    out = bytearray(WIDTH.size + COUNT.size + len(cs) * width)
+    WIDTH.pack_into(out, 0, width)
+    _pack_ciphertexts(cs, width, out, WIDTH.size)
+    return out
+
+
+def decode_round3_packed(view):
+    (width,) = WIDTH.unpack_from(view, 0)
+    cs, _ = _split_ciphertexts(view, WIDTH.size, width, MAX_SLOTS)
+    return cs
+
+
+def encode_round3(c, n):
+    width = ciphertext_width(n)
+    return WIDTH.pack(width) + c.to_bytes(width, 'big')
+
+
+def decode_round3(view):
+    (width,) = WIDTH.unpack_from(view, 0)
+    if WIDTH.size + width > len(view):
+        raise ValueError("truncated frame")
+    return int.from_bytes(view[WIDTH.size:WIDTH.size + width], 'big')
+
+
+# --- framing ---
+def send_frame(conn, msg_type, payload):
+    conn.sendall(frame_header(msg_type, len(payload)))
+    conn.sendall(payload)
+
+
+def _recv_exact_into(conn, view):
+    got = 0
+    while got < len(view):
+        n = conn.recv_into(view[got:])
+        if not n:
+            raise ConnectionError("unexpected EOF")
+        got += n
+
+
+# Frame size limits by type, checked before any payload buffer is allocated.
+FRAME_LIMITS = {
+    ROUND1: COUNT.size + MAX_POINTS * POINT_SIZE,
+    ROUND2: MAX_ROUND2,
+    ROUND2P: MAX_ROUND2,
+    ROUND3: WIDTH.size + MAX_CIPHERTEXT,
+    ROUND3P: WIDTH.size + COUNT.size + MAX_SLOTS * MAX_CIPHERTEXT,
+}
+
+
+def _check_header(header, expected_type, max_size):
+    version, msg_type, length = HEADER.unpack(header)
+    if version != VERSION:
+        raise ValueError(f"unsupported wire version {version}")
+    if expected_type is not None and msg_type != expected_type:
+        raise ValueError(f"protocol error: expecting {TYPE_NAMES[expected_type]}, "
+                         f"got {TYPE_NAMES.get(msg_type, msg_type)}")
+    if max_size is None:
+        max_size = FRAME_LIMITS.get(msg_type, MAX_FRAME)
+    if length > max_size:
+        raise ValueError("frame too large")
+    return msg_type, length
+
+
+def recv_frame(conn, expected_type=None, max_size=None):
+    """read one frame into a preallocated buffer; returns (type, memoryview of payload)
+
+    max_size defaults to the limit for the frame's type (FRAME_LIMITS)."""
+    header = bytearray(HEADER.size)
+    _recv_exact_into(conn, memoryview(header))
+    msg_type, length = _check_header(header, expected_type, max_size)
+    buf = memoryview(bytearray(length))
+    _recv_exact_into(conn, buf)
+    return msg_type, buf
+
+
+async def read_frame(reader, expected_type=None, max_size=None):
+    """asyncio variant of recv_frame for an asyncio.StreamReader"""
+    header = await reader.readexactly(HEADER.size)
+    msg_type, length = _check_header(header, expected_type, max_size)
+    return msg_type, memoryview(await reader.readexactly(length))
+
+
+def frame_header(msg_type, length):
+    return HEADER.pack(VERSION, msg_type, length)
+
+
+def choose_format(offered):
+    """server side of the HELLO negotiation: first supported format in our preference order"""
+    for fmt in FORMATS:
+        if fmt in offered:
+            return fmt
+    return "json"